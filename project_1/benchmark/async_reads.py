@@ -0,0 +1,112 @@
+"""Benchmark of the book detail reads of the asyncio manager against the threaded synchronous manager"""
+import asyncio
+import random
+import threading
+import time
+
+from project_1.benchmark.metrics import summarize_latencies
+from project_1.database.async_database_manager import AsyncComicBooksDBManager
+from project_1.database.database_manager import ComicBooksDBManager
+
+
+def _book_ids(conn_params, schema, table_prefix, count, seed):
+    """
+    :returns: list of count random book ids of the loaded books
+    """
+    manager = ComicBooksDBManager.create(**conn_params, schema=schema, table_prefix=table_prefix)
+    try:
+        min_book_id, max_book_id = manager.get_book_id_range()
+    finally:
+        manager.close()
+    if min_book_id is None:
+        raise ValueError("There are no books in the database, run the main flow first")
+    rng = random.Random(seed)
+    return [rng.randint(min_book_id, max_book_id) for _ in range(count)]
+
+
+def _run_threaded(conn_params, schema, table_prefix, book_ids, concurrency):
+    """
+    Reads the book details from concurrency threads, each one with its own synchronous manager.
+    :returns: (elapsed seconds, latencies)
+    """
+    latencies = []
+    latencies_lock = threading.Lock()
+    chunks = [book_ids[index::concurrency] for index in range(concurrency)]
+
+    def client(chunk):
+        manager = ComicBooksDBManager.create(**conn_params, schema=schema, table_prefix=table_prefix)
+        local = []
+        try:
+            for book_id in chunk:
+                start = time.perf_counter()
+                manager.get_book_details(book_id)
+                manager.commit()
+                local.append(time.perf_counter() - start)
+        finally:
+            manager.close()
+        with latencies_lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, latencies
+
+
+async def _run_async(conn_params, schema, table_prefix, book_ids, concurrency, pool_size):
+    """
+    Reads the book details from concurrency tasks that share a pool of pool_size connections.
+    :returns: (elapsed seconds, latencies)
+    """
+    manager = await AsyncComicBooksDBManager.create(**conn_params, schema=schema, table_prefix=table_prefix,
+                                                    min_size=pool_size, max_size=pool_size)
+    latencies = []
+
+    async def client(chunk):
+        for book_id in chunk:
+            start = time.perf_counter()
+            await manager.get_book_details(book_id)
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(book_ids[index::concurrency]) for index in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await manager.close()
+    return elapsed, latencies
+
+
+def run_async_read_benchmark(conn_params, concurrency=64, requests=5000, pool_size=None, schema=None,
+                             table_prefix=None, seed=None):
+    """
+    Reads the same random books, along with their authors and reviews, first with concurrency threads that
+    each use a synchronous manager and then with concurrency asyncio tasks that share a pool of the async
+    manager. By default both runs use the same number of connections, so they differ only in how the
+    clients share them.
+    :param conn_params: dict with the database, password, user, host and port of the database
+    :param concurrency: number of concurrent clients
+    :param requests: total number of book detail reads
+    :param pool_size: connections of the async pool, defaults to concurrency, the threaded run uses one
+    connection per thread
+    :param schema: schema of the tables, defaults to ComicBooksDBManager.DEFAULT_SCHEMA
+    :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+    :param seed: seed of the book choices
+    :returns: {"threaded": results, "async": results}, each with its connections, the throughput and the
+    latencies
+    """
+    pool_size = pool_size if pool_size else concurrency
+    book_ids = _book_ids(conn_params, schema, table_prefix, requests, seed)
+    results = {}
+    for name, connections, run in (
+            ("threaded", concurrency, lambda: _run_threaded(conn_params, schema, table_prefix, book_ids,
+                                                            concurrency)),
+            ("async", pool_size, lambda: asyncio.run(_run_async(conn_params, schema, table_prefix, book_ids,
+                                                                concurrency, pool_size)))):
+        elapsed, latencies = run()
+        results[name] = {"concurrency": concurrency, "connections": connections, "elapsed_s": elapsed,
+                         "throughput": len(latencies) / elapsed, "latency": summarize_latencies(latencies)}
+    return results
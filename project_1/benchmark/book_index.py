@@ -0,0 +1,122 @@
+"""Benchmark of the book indexes of the reviews pass of the parser"""
+import itertools
+import json
+import os
+import time
+import tracemalloc
+
+from project_1.parser.book_index import BOOK_INDEX_KINDS, build_book_index
+from project_1.parser.parser import UCSDJsonDataParser
+
+
+def read_book_ids(path):
+    """
+    :param path: path of the book data
+    :returns: list of the book ids of the book data
+    """
+    with open(path) as fin:
+        return [book_id for line in fin if (book_id := json.loads(line).get("book_id"))]
+
+
+def read_review_book_ids(path, limit=None):
+    """
+    :param path: path of the review data
+    :param limit: maximum number of reviews read
+    :returns: list of the book ids of the reviews, in the order of the review data
+    """
+    with open(path) as fin:
+        matches = (UCSDJsonDataParser.REVIEW_BOOK_ID_PATTERN.search(line) for line in itertools.islice(fin, limit))
+        return [match.group(1) for match in matches if match]
+
+
+def run_book_index_benchmark(book_ids, lookups, kinds=BOOK_INDEX_KINDS, bloom_error_rate=0.01):
+    """
+    Builds each index, with and without a Bloom filter, and looks up the given ids. The dict index is the
+    book dictionary itself and needs no memory of its own, see run_reviews_pass_benchmark for the memory of
+    the parser with each index.
+    :param book_ids: list of the indexed book ids
+    :param lookups: list of the looked up book ids
+    :param kinds: the index kinds compared
+    :param bloom_error_rate: false positive rate of the Bloom filters
+    :returns: [{"index": str, "build_s": float, "index_mb": float, "lookup_s": float, "lookup_ns": float,
+                "hits": int}]
+    """
+    books = dict.fromkeys(book_ids)
+    results = []
+    for kind, error_rate in itertools.product(kinds, (None, bloom_error_rate)):
+        # tracing slows the allocations down, so the memory is measured on a separate build
+        tracemalloc.start()
+        index = build_book_index(books, kind, error_rate)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        index.close()
+        start = time.perf_counter()
+        index = build_book_index(books, kind, error_rate)
+        build_s = time.perf_counter() - start
+        try:
+            start = time.perf_counter()
+            hits = sum(1 for book_id in lookups if book_id in index)
+            lookup_s = time.perf_counter() - start
+        finally:
+            index.close()
+        results.append({"index": kind if error_rate is None else f"{kind}+bloom", "build_s": build_s,
+                        "index_mb": memory / 2 ** 20, "lookup_s": lookup_s,
+                        "lookup_ns": 1e9 * lookup_s / len(lookups) if lookups else None, "hits": hits})
+    return results
+
+
+def run_reviews_pass_benchmark(data_path=None, genre=None, kinds=BOOK_INDEX_KINDS, bloom_error_rate=0.01,
+                               **parser_options):
+    """
+    Parses a genre dataset with each index, with and without a Bloom filter, and traces the memory of the
+    reviews pass of the parser. The memory of the whole parse is traced, so the peak of the pass includes
+    the book data that stay in memory during it, e.g. the book dictionary of the dict index.
+    :param data_path: path to the json data, defaults to UCSDJsonDataParser.DEFAULT_DATA_PATH
+    :param genre: the goodreads genre, defaults to UCSDJsonDataParser.DEFAULT_GENRE
+    :param kinds: the index kinds compared
+    :param bloom_error_rate: false positive rate of the Bloom filters
+    :param parser_options: other keyword arguments of UCSDJsonDataParser, e.g. book_limit
+    :returns: [{"index": str, "start_mb": float, "peak_mb": float, "end_mb": float, "seconds": float,
+                "reviews": int}], the memory traced when the pass starts, at its peak and when it ends
+    """
+    results = []
+    for kind, error_rate in itertools.product(kinds, (None, bloom_error_rate)):
+        json_parser = UCSDJsonDataParser(data_path=data_path, genre=genre, book_index=kind,
+                                         bloom_error_rate=error_rate, **parser_options)
+        tracemalloc.start()
+        try:
+            json_parser.process_book_data()
+            start_memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            json_parser.process_review_data()
+            seconds = time.perf_counter() - start
+            end_memory, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results.append({"index": kind if error_rate is None else f"{kind}+bloom", "start_mb": start_memory / 2 ** 20,
+                        "peak_mb": peak_memory / 2 ** 20, "end_mb": end_memory / 2 ** 20, "seconds": seconds,
+                        "reviews": len(json_parser.get_parsed_review_data())})
+        # deletes the spilled book data
+        json_parser.get_parsed_book_data()
+    return results
+
+
+def run_parser_book_index_benchmark(data_path=None, genre=None, review_limit=1000000, bloom_error_rate=0.01):
+    """
+    Runs run_book_index_benchmark with the book ids of a genre dataset and the book ids of its reviews, and
+    run_reviews_pass_benchmark with the dataset.
+    :param data_path: path to the json data, defaults to UCSDJsonDataParser.DEFAULT_DATA_PATH
+    :param genre: the goodreads genre, defaults to UCSDJsonDataParser.DEFAULT_GENRE
+    :param review_limit: maximum number of reviews looked up
+    :param bloom_error_rate: false positive rate of the Bloom filters
+    :returns: {"lookups": results of run_book_index_benchmark, "reviews_pass": results of
+               run_reviews_pass_benchmark}
+    """
+    data_path = data_path if data_path else UCSDJsonDataParser.DEFAULT_DATA_PATH
+    genre = genre if genre else UCSDJsonDataParser.DEFAULT_GENRE
+    book_ids = read_book_ids(os.path.join(data_path, UCSDJsonDataParser.BOOKS_FILENAME.format(genre=genre)))
+    lookups = read_review_book_ids(os.path.join(data_path, UCSDJsonDataParser.REVIEWS_FILENAME.format(genre=genre)),
+                                   review_limit)
+    return {"lookups": run_book_index_benchmark(book_ids, lookups, bloom_error_rate=bloom_error_rate),
+            "reviews_pass": run_reviews_pass_benchmark(data_path, genre, bloom_error_rate=bloom_error_rate)}
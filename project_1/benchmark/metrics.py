@@ -0,0 +1,62 @@
+"""Helpers for summarizing benchmark measurements"""
+
+
+def percentile(sorted_values, fraction):
+    """
+    :param sorted_values: list of values sorted in ascending order
+    :param fraction: the percentile as a fraction (0 - 1)
+    :returns: the nearest rank percentile, None for an empty list
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies):
+    """
+    :param latencies: iterable of latencies in seconds
+    :returns: {"count": int, "mean_ms": float, "p50_ms": float, "p99_ms": float, "max_ms": float}
+    """
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p99_ms": None, "max_ms": None}
+    return {"count": len(values), "mean_ms": 1000 * sum(values) / len(values),
+            "p50_ms": 1000 * percentile(values, 0.5), "p99_ms": 1000 * percentile(values, 0.99),
+            "max_ms": 1000 * values[-1]}
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies with fixed bucket bounds, in milliseconds"""
+    BOUNDS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+
+    def __str__(self):
+        return f"LatencyHistogram(count={sum(self.counts)})"
+
+    def add(self, latency):
+        """
+        :param latency: latency in seconds
+        """
+        latency_ms = 1000 * latency
+        for index, bound in enumerate(self.BOUNDS_MS):
+            if latency_ms <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def merge(self, other):
+        """
+        :param other: LatencyHistogram whose counts are added to this one
+        """
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+
+    def to_dict(self):
+        """
+        :returns: {"<=bound_ms": count, ..., ">last_bound_ms": count}
+        """
+        buckets = {f"<={bound}ms": count for bound, count in zip(self.BOUNDS_MS, self.counts)}
+        buckets[f">{self.BOUNDS_MS[-1]}ms"] = self.counts[-1]
+        return buckets
@@ -0,0 +1,166 @@
+"""Concurrent benchmark of ComicBooksDBManager.replace_order"""
+import random
+import threading
+import time
+
+import psycopg2
+from psycopg2 import errorcodes
+
+from project_1.benchmark.metrics import summarize_latencies
+from project_1.database.database_manager import ComicBooksDBManager, ComicBooksSQLMixin
+
+
+class _LockWaitMonitor(threading.Thread):
+    """Samples pg_locks periodically and keeps the number of samples that found waiting lock requests"""
+
+    def __init__(self, conn_params, interval=0.01):
+        """
+        :param conn_params: connection parameters passed to psycopg2.connect
+        :param interval: seconds between two samples
+        """
+        super(_LockWaitMonitor, self).__init__(daemon=True)
+        self._conn_params = conn_params
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiting = 0
+
+    def __str__(self):
+        return f"_LockWaitMonitor(samples={self.samples})"
+
+    def run(self):
+        conn = psycopg2.connect(**self._conn_params)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                while not self._stop_event.wait(self._interval):
+                    cursor.execute("""select count(*) from pg_locks where not granted""")
+                    waiting = cursor.fetchone()[0]
+                    self.samples += 1
+                    self.waiting_samples += 1 if waiting else 0
+                    self.max_waiting = max(self.max_waiting, waiting)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _database_deadlocks(cursor):
+    """
+    :returns: the number of deadlocks detected in the current database since the statistics reset
+    """
+    cursor.execute("""select deadlocks from pg_stat_database where datname = current_database()""")
+    return cursor.fetchone()[0]
+
+
+def run_order_replacement_benchmark(conn_params, threads=8, transactions_per_thread=200, items_per_order=3,
+                                    seed=None, schema=None, table_prefix=None):
+    """
+    Replaces random orders of the population created by ComicBooksDBManager.create_test_data from several
+    threads, each with its own connection. Threads pick the users at random, so the same order is
+    sometimes replaced concurrently, which exercises the row locks of the transaction.
+    :param conn_params: dict with the database, password, user, host and port of the database
+    :param threads: number of concurrent clients
+    :param transactions_per_thread: number of replacements each client executes
+    :param items_per_order: number of distinct books in each new order, given by their isbns
+    :param seed: seed used for picking the users and books
+    :param schema: schema of the tables, defaults to ComicBooksDBManager.DEFAULT_SCHEMA
+    :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+    :returns: dict with the throughput of the applied replacements, the latencies of all the completed calls,
+    the lock statistics and the hits and misses of the isbn lookups of the managers, whose caches are warmed
+    when the clients start
+    """
+    # names the tables with the schema and the prefix of the benchmarked managers
+    tables = ComicBooksSQLMixin(schema=schema, table_prefix=table_prefix)
+    setup_conn = psycopg2.connect(**conn_params)
+    cursor = setup_conn.cursor()
+    cursor.execute(f"""select user_id, max(order_id) from {tables.table_name("order")} group by user_id""")
+    current_orders = dict(cursor.fetchall())
+    # the customers order by isbn, like the workload, the books of the test orders are the ones ordered
+    cursor.execute(f"""
+        select distinct isbn from {tables.table_name("book")}
+        where book_id in (select book_id from {tables.table_name("book_order")})
+        order by isbn
+    """)
+    isbns = [row[0] for row in cursor.fetchall()]
+    if not current_orders or len(isbns) < items_per_order:
+        setup_conn.close()
+        raise ValueError("Not enough test data, run the test flow first")
+    deadlocks_before = _database_deadlocks(cursor)
+    # statistics are cached for the duration of a transaction
+    setup_conn.commit()
+
+    orders_lock = threading.Lock()
+    results = {"latencies": [], "replaced": 0, "stale": 0, "deadlocks": 0, "serialization_failures": 0,
+               "errors": 0, "lookup_hits": 0, "lookup_misses": 0}
+    results_lock = threading.Lock()
+    rng = random.Random(seed)
+    user_ids = sorted(current_orders)
+
+    def client(client_seed):
+        client_rng = random.Random(client_seed)
+        manager = ComicBooksDBManager.create(**conn_params, schema=schema, table_prefix=table_prefix)
+        manager.warm_lookup_caches()
+        latencies, counters = [], {"replaced": 0, "stale": 0, "deadlocks": 0, "serialization_failures": 0,
+                                   "errors": 0}
+        try:
+            for _ in range(transactions_per_thread):
+                user_id = client_rng.choice(user_ids)
+                with orders_lock:
+                    order_id = current_orders[user_id]
+                items = [(isbn, client_rng.randint(1, 4)) for isbn in client_rng.sample(isbns, items_per_order)]
+                start = time.perf_counter()
+                try:
+                    new_order_id = manager.replace_order(user_id, order_id, items)
+                except psycopg2.Error as error:
+                    if error.pgcode == errorcodes.DEADLOCK_DETECTED:
+                        counters["deadlocks"] += 1
+                    elif error.pgcode == errorcodes.SERIALIZATION_FAILURE:
+                        counters["serialization_failures"] += 1
+                    else:
+                        counters["errors"] += 1
+                    continue
+                except ValueError:
+                    # the book of an isbn has been deleted
+                    counters["errors"] += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if new_order_id is None:
+                    # another client replaced the order first
+                    counters["stale"] += 1
+                    continue
+                counters["replaced"] += 1
+                with orders_lock:
+                    if current_orders[user_id] == order_id:
+                        current_orders[user_id] = new_order_id
+            book_lookups = manager.lookup_cache_statistics()["books"]
+            counters["lookup_hits"], counters["lookup_misses"] = book_lookups["hits"], book_lookups["misses"]
+        finally:
+            manager.close()
+        with results_lock:
+            results["latencies"].extend(latencies)
+            for key, value in counters.items():
+                results[key] += value
+
+    monitor = _LockWaitMonitor(conn_params)
+    monitor.start()
+    workers = [threading.Thread(target=client, args=(rng.random(),)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+
+    deadlocks_after = _database_deadlocks(cursor)
+    setup_conn.close()
+    latencies = summarize_latencies(results.pop("latencies"))
+    # stale replacements are no-ops, so only the applied replacements count as transactions
+    return {"threads": threads, "elapsed_s": elapsed, "tps": results["replaced"] / elapsed,
+            "latency": latencies, **results, "server_deadlocks": deadlocks_after - deadlocks_before,
+            "lock_wait_samples": monitor.waiting_samples, "lock_samples": monitor.samples,
+            "max_waiting_locks": monitor.max_waiting}
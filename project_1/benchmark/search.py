@@ -0,0 +1,56 @@
+"""Benchmark of the full text search of ComicBooksDBManager with and without the GIN indexes"""
+import time
+
+from project_1.benchmark.metrics import summarize_latencies
+from project_1.database.database_manager import ComicBooksDBManager
+
+DEFAULT_QUERIES = ("batman", "great art", "alan moore", "boring story", "manga -anime", "\"graphic novel\"")
+
+
+def _time_queries(search, queries, repetitions, limit):
+    """
+    :param search: search method of the manager
+    :returns: the latencies of the queries, in seconds
+    """
+    latencies = []
+    for _ in range(repetitions):
+        for query in queries:
+            start = time.perf_counter()
+            search(query, limit=limit)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_search_benchmark(conn_params, queries=DEFAULT_QUERIES, repetitions=10, limit=20, schema=None,
+                         table_prefix=None):
+    """
+    Runs the review and book searches with the GIN indexes, drops the indexes and runs them again, so both
+    runs use the same stored tsvector columns and differ only in the indexes. The indexes are recreated at
+    the end.
+    :param conn_params: dict with the database, password, user, host and port of the database
+    :param queries: web search syntax queries
+    :param repetitions: number of times each query is executed in each run
+    :param limit: page size of the searches
+    :param schema: schema of the tables, defaults to ComicBooksDBManager.DEFAULT_SCHEMA
+    :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+    :returns: {"indexed": {"reviews": latencies, "books": latencies}, "sequential": {...}}
+    """
+    manager = ComicBooksDBManager.create(**conn_params, schema=schema, table_prefix=table_prefix)
+    if manager is None:
+        raise ConnectionError("Could not connect to the database")
+    results = {}
+    try:
+        manager.create_search_indexes()
+        # warm up the caches, so the first run is not penalized
+        _time_queries(manager.search_reviews, queries, 1, limit)
+        _time_queries(manager.search_books, queries, 1, limit)
+        for name in ("indexed", "sequential"):
+            results[name] = {
+                "reviews": summarize_latencies(_time_queries(manager.search_reviews, queries, repetitions, limit)),
+                "books": summarize_latencies(_time_queries(manager.search_books, queries, repetitions, limit))
+            }
+            manager.drop_search_indexes()
+        manager.create_search_indexes()
+    finally:
+        manager.close()
+    return results
@@ -0,0 +1,63 @@
+"""Benchmark of the batch application of the validation rule sets against a per record evaluation"""
+import copy
+import itertools
+import json
+import os
+import time
+
+from project_1.parser.parser import UCSDJsonDataParser
+from project_1.parser.validation import Rule, RuleSet
+
+
+def _apply_per_record(rules, records):
+    """
+    Evaluates the rules record by record and field by field, the way the parser validated the records
+    before the rule sets.
+    :returns: list of the valid records
+    """
+    valid = []
+    for record in records:
+        if any(rule.action == Rule.REJECT and not rule.check(record.get(rule.field)) for rule in rules):
+            continue
+        for rule in rules:
+            if rule.action == Rule.NULLIFY and not rule.check(record.get(rule.field)):
+                record[rule.field] = None
+        valid.append(record)
+    return valid
+
+
+def run_validation_benchmark(data_path=None, genre=None, batch_size=None, record_limit=200000, repetitions=3):
+    """
+    Validates the book records of a genre dataset with the rule set of the parser and with a per record
+    evaluation of the same rules, and reports the best time of each.
+    :param data_path: path to the json data, defaults to UCSDJsonDataParser.DEFAULT_DATA_PATH
+    :param genre: the goodreads genre, defaults to UCSDJsonDataParser.DEFAULT_GENRE
+    :param batch_size: records per batch, defaults to UCSDJsonDataParser.BATCH_SIZE
+    :param record_limit: maximum number of book records read
+    :param repetitions: number of times each evaluation runs
+    :returns: {"records": int, "valid": int, "batch_s": float, "per_record_s": float, "speedup": float}
+    """
+    json_parser = UCSDJsonDataParser(data_path=data_path, genre=genre, batch_size=batch_size)
+    with open(os.path.join(json_parser.data_path, json_parser.books_filename)) as fin:
+        records = [json.loads(line) for line in itertools.islice(fin, record_limit)]
+    batches = [records[index:index + json_parser.batch_size]
+               for index in range(0, len(records), json_parser.batch_size)]
+    rules = json_parser.get_rules("books")
+
+    def best_time(validate):
+        best, valid = None, 0
+        for _ in range(repetitions):
+            # the nullify rules modify the records, so every repetition validates fresh copies
+            copies = copy.deepcopy(batches)
+            start = time.perf_counter()
+            valid = sum(len(validate(batch)) for batch in copies)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, valid
+
+    batch_s, valid = best_time(RuleSet("books", rules).apply)
+    per_record_s, per_record_valid = best_time(lambda batch: _apply_per_record(rules, batch))
+    if valid != per_record_valid:
+        raise AssertionError(f"The evaluations disagree, {valid} != {per_record_valid} valid records")
+    return {"records": len(records), "valid": valid, "batch_s": batch_s, "per_record_s": per_record_s,
+            "speedup": per_record_s / batch_s if batch_s else None}
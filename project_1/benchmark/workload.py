@@ -0,0 +1,261 @@
+"""Mixed storefront (OLTP) workload generator built on the fake data factories"""
+import itertools
+import json
+import random
+import threading
+import time
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from project_1.benchmark.metrics import LatencyHistogram, summarize_latencies
+from project_1.database.database_manager import ComicBooksDBManager, ComicBooksSQLMixin
+from project_1.database.factories import (UserFactory, AddressFactory, UserAddressFactory, OrderFactory,
+                                          ReviewFactory)
+
+# the factories share a single Faker instance, which is not safe to use from several threads
+_factory_lock = threading.Lock()
+
+
+class WorkloadGenerator(ComicBooksSQLMixin):
+    """
+    Drives a weighted mix of storefront operations against the database from a pool of threads that share
+    a pool of connections. The supported operations are:
+        sign_up: creates a user with an address,
+        place_order: places an order of a random user for 1 - 3 random books, chosen by isbn,
+        read_book: reads a random book along with its authors and reviews,
+        post_review: posts a review for a random book.
+    """
+    DEFAULT_MIX = {"sign_up": 1, "place_order": 2, "read_book": 6, "post_review": 1}
+
+    def __init__(self, conn_params, mix=None, threads=8, pool_size=None, seed=None, schema=None, table_prefix=None):
+        """
+        :param conn_params: dict with the database, password, user, host and port of the database
+        :param mix: {operation: weight}, defaults to DEFAULT_MIX
+        :param threads: number of client threads
+        :param pool_size: maximum number of pooled connections, defaults to the number of threads
+        :param seed: seed of the operation and data choices
+        :param schema: schema of the tables, defaults to ComicBooksDBManager.DEFAULT_SCHEMA
+        :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+        """
+        super(WorkloadGenerator, self).__init__(schema=schema, table_prefix=table_prefix)
+        self.conn_params = conn_params
+        self.mix = mix if mix else dict(self.DEFAULT_MIX)
+        unknown = set(self.mix) - set(self.DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown operations {sorted(unknown)}")
+        self.threads = threads
+        self.pool_size = pool_size if pool_size else threads
+        self.seed = seed
+        # caches the isbn lookups, which run on the cursors of the pooled connections
+        self._manager = ComicBooksDBManager(schema=schema, table_prefix=table_prefix)
+        self._operations = {"sign_up": self._sign_up, "place_order": self._place_order,
+                            "read_book": self._read_book, "post_review": self._post_review}
+        self._unique_suffix = itertools.count()
+        self._user_ids = []
+        self._users_lock = threading.Lock()
+        self._book_id_range = None
+        self._isbns = []
+
+    def __str__(self):
+        return f"WorkloadGenerator(mix={self.mix}, threads={self.threads})"
+
+    def _load_population(self, cursor):
+        """Reads the existing users, the range of the book ids and the isbns, and warms the isbn lookups"""
+        cursor.execute(f"""select user_id from {self._table("user")} """)
+        self._user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"""select min(book_id), max(book_id) from {self._table("book")} """)
+        self._book_id_range = cursor.fetchone()
+        if self._book_id_range[0] is None:
+            raise ValueError("There are no books in the database, run the main flow first")
+        cursor.execute(f"""select distinct isbn from {self._table("book")} """)
+        self._isbns = [row[0] for row in cursor.fetchall()]
+        self._manager.warm_lookup_caches(cursor)
+        # the partitioned review tables hold the book id of each review
+        cursor.execute(self._review_partition_size_sql())
+        self._review_partition_size = self._review_partition_size_from_bounds(cursor.fetchone())
+
+    def _random_book_id(self, rng):
+        return rng.randint(*self._book_id_range)
+
+    def _random_user_id(self, rng):
+        with self._users_lock:
+            return rng.choice(self._user_ids) if self._user_ids else None
+
+    def _sign_up(self, cursor, rng):
+        with _factory_lock:
+            user = UserFactory.generate_user()
+            address = next(AddressFactory.generate_addresses())
+            user_address = next(UserAddressFactory.generate_user_addresses({}))
+        # the factories only guarantee uniqueness within a single call
+        suffix = next(self._unique_suffix)
+        user.username = f"{user.username}_{suffix}_{rng.getrandbits(32)}"
+        user.email = f"{suffix}.{rng.getrandbits(32)}.{user.email}"
+        cursor.execute(f"""
+            insert into {self._table("user")}(username, password, phone_number, email, real_name)
+            values (%s, %s, %s, %s, %s) returning user_id
+        """, [user.username, user.password, user.phone_number, user.email, user.real_name])
+        user_id = cursor.fetchone()[0]
+        cursor.execute(f"""
+            insert into {self._table("address")}(address_name, address_number, city, country, postal_code)
+            values (%s, %s, %s, %s, %s) returning address_id
+        """, [address.address_name, address.address_number, address.city, address.country, address.postal_code])
+        address_id = cursor.fetchone()[0]
+        cursor.execute(f"""
+            insert into {self._table("user_address")}
+                (address_id, user_id, is_physical, is_shipping, is_billing, is_active)
+            values (%s, %s, %s, %s, %s, %s)
+        """, [address_id, user_id, user_address.is_physical, user_address.is_shipping, user_address.is_billing,
+              user_address.is_active])
+        return lambda: self._add_user(user_id)
+
+    def _add_user(self, user_id):
+        with self._users_lock:
+            self._user_ids.append(user_id)
+
+    def _place_order(self, cursor, rng):
+        user_id = self._random_user_id(rng)
+        if user_id is None:
+            return None
+        cursor.execute(f"""select address_id from {self._table("user_address")} where user_id = %s limit 1""",
+                       [user_id])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        # customers order distinct isbns, which are resolved by the cached lookup of the manager, the isbns
+        # of books that have been deleted since the population was read are skipped
+        isbns = rng.sample(self._isbns, min(rng.randint(1, 3), len(self._isbns)))
+        books = [self._manager.get_book_by_isbn(isbn, cursor) for isbn in isbns]
+        items = [(book[0], rng.randint(1, 4)) for book in books if book is not None]
+        if not items:
+            return None
+        with _factory_lock:
+            order = next(OrderFactory.generate_orders({1: [row[0]]}))
+        cursor.execute(f"""
+            insert into {self._table("order")}(user_id, billing_address_id, shipping_address_id, placement)
+            values (%s, %s, %s, %s) returning order_id
+        """, [user_id, order.billing_address, order.shipping_address, order.placement])
+        order_id = cursor.fetchone()[0]
+        for book_id, quantity in items:
+            cursor.execute(f"""
+                insert into {self._table("book_order")}(book_id, order_id, quantity) values (%s, %s, %s)
+            """, [book_id, order_id, quantity])
+        return None
+
+    def _read_book(self, cursor, rng):
+        # the reviews of a partitioned review table are read only from the partition of the book
+        cursor.execute(self._book_details_sql("book_id = %s"), [self._random_book_id(rng)])
+        cursor.fetchall()
+        return None
+
+    def _post_review(self, cursor, rng):
+        book_id = self._random_book_id(rng)
+        with _factory_lock:
+            review = next(ReviewFactory.generate_reviews())
+        if self._review_partition_size:
+            cursor.execute(f"""
+                insert into {self._table("review")}(book_id, created, nickname, score, text)
+                values (%s, now(), %s, %s, %s) returning review_id
+            """, [book_id, review.nickname, review.score, review.text])
+        else:
+            cursor.execute(f"""
+                insert into {self._table("review")}(created, nickname, score, text)
+                values (now(), %s, %s, %s) returning review_id
+            """, [review.nickname, review.score, review.text])
+        review_id = cursor.fetchone()[0]
+        cursor.execute(f"""insert into {self._table("book_review")}(book_id, review_id) values (%s, %s)""",
+                       [book_id, review_id])
+        return None
+
+    def run(self, operations_per_thread=1000):
+        """
+        Runs the workload.
+        :param operations_per_thread: number of operations each thread executes
+        :returns: dict with the overall and the per operation throughput, latencies and histograms
+        """
+        # the pool closes the connections that are returned above its minimum, so it keeps all of them open
+        pool = ThreadedConnectionPool(self.pool_size, self.pool_size, **self.conn_params)
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                self._load_population(cursor)
+            conn.commit()
+        finally:
+            pool.putconn(conn)
+
+        names = sorted(self.mix)
+        weights = [self.mix[name] for name in names]
+        results = {name: {"latencies": [], "errors": 0, "histogram": LatencyHistogram()} for name in names}
+        results_lock = threading.Lock()
+        rng = random.Random(self.seed)
+
+        def client(client_seed):
+            client_rng = random.Random(client_seed)
+            local = {name: {"latencies": [], "errors": 0, "histogram": LatencyHistogram()} for name in names}
+            for name in client_rng.choices(names, weights=weights, k=operations_per_thread):
+                start = time.perf_counter()
+                client_conn = None
+                try:
+                    client_conn = pool.getconn()
+                    with client_conn.cursor() as cursor:
+                        on_commit = self._operations[name](cursor, client_rng)
+                    client_conn.commit()
+                    if on_commit:
+                        on_commit()
+                except Exception:
+                    # a failed operation, e.g. a constraint violation or an exhausted pool, is counted and
+                    # the client goes on with the next one
+                    local[name]["errors"] += 1
+                    continue
+                finally:
+                    # the pool rolls back an open transaction and discards a broken connection
+                    if client_conn is not None:
+                        pool.putconn(client_conn)
+                latency = time.perf_counter() - start
+                local[name]["latencies"].append(latency)
+                local[name]["histogram"].add(latency)
+            with results_lock:
+                for name, measurements in local.items():
+                    results[name]["latencies"].extend(measurements["latencies"])
+                    results[name]["errors"] += measurements["errors"]
+                    results[name]["histogram"].merge(measurements["histogram"])
+
+        workers = [threading.Thread(target=client, args=(rng.random(),)) for _ in range(self.threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        pool.closeall()
+
+        operations = {}
+        for name, measurements in results.items():
+            latencies = summarize_latencies(measurements["latencies"])
+            operations[name] = {"throughput": latencies["count"] / elapsed, "errors": measurements["errors"],
+                                "latency": latencies, "histogram": measurements["histogram"].to_dict()}
+        total = sum(operation["latency"]["count"] for operation in operations.values())
+        return {"threads": self.threads, "pool_size": self.pool_size, "mix": self.mix, "elapsed_s": elapsed,
+                "throughput": total / elapsed, "operations": operations,
+                "lookup_cache": self._manager.lookup_cache_statistics()}
+
+    @staticmethod
+    def export(results, path):
+        """
+        Writes the results of a run as json, so that different runs can be compared.
+        :param results: the results returned by run
+        :param path: the output file path
+        """
+        with open(path, "w") as fout:
+            json.dump(results, fout, indent=2, default=str)
+
+
+def parse_mix(mix):
+    """
+    :param mix: string of the form "read_book=6,place_order=2"
+    :returns: {operation: weight}
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight) if weight else 1.0
+    return weights
@@ -0,0 +1,229 @@
+"""asyncio variant of ComicBooksDBManager, for services that serve the book data concurrently"""
+import json
+import time
+
+import asyncpg
+
+from project_1.database.commit_policy import CommitPolicy
+from project_1.database.database_manager import ComicBooksSQLMixin
+
+
+class AsyncComicBooksDBManager(ComicBooksSQLMixin):
+    """
+    Reads and writes the book data over a pool of asyncpg connections. Each call acquires a connection of the
+    pool only for its own queries, so many requests are served concurrently by a few connections. asyncpg
+    prepares and caches the statements of each connection, so the repeated queries are parsed once. Each
+    write path runs in its own transaction, which is committed and measured by the commit policy; the
+    connections are returned to the pool after each call, so the row and time thresholds of the policy do
+    not apply.
+    """
+    POOL_MIN_SIZE = 1
+    POOL_MAX_SIZE = 10
+
+    def __init__(self, schema=None, table_prefix=None, review_partition_size=None, commit_policy=None):
+        """
+        :param schema: the schema of the tables, defaults to ComicBooksDBManager.DEFAULT_SCHEMA
+        :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+        :param review_partition_size: book ids per review partition, if the review tables are partitioned
+        :param commit_policy: CommitPolicy whose session settings the connections use and that records the
+        commits, defaults to one commit per write path
+        """
+        super(AsyncComicBooksDBManager, self).__init__(schema=schema, table_prefix=table_prefix)
+        self._review_partition_size = review_partition_size
+        self.commit_policy = commit_policy if commit_policy else CommitPolicy()
+        self._pool = None
+
+    def __str__(self):
+        return f"AsyncComicBooksDBManager(schema={self.schema}, prefix={self.table_prefix})"
+
+    async def close(self):
+        await self._pool.close()
+
+    async def _configure(self, conn):
+        """
+        Applies the session settings of the commit policy to a new pooled connection.
+        :param conn: asyncpg connection
+        """
+        for statement in self.commit_policy.session_statements():
+            await conn.execute(statement)
+
+    async def _commit(self, transaction, rows=0):
+        """
+        Commits the transaction and records the commit in the commit policy.
+        :param transaction: asyncpg transaction that has been started
+        :param rows: rows written in the transaction
+        """
+        start = time.perf_counter()
+        await transaction.commit()
+        self.commit_policy.record_commit(time.perf_counter() - start, rows)
+
+    async def get_book(self, book_id):
+        """
+        :param book_id: the database id of the book
+        :returns: record of book_id, isbn, title, description, publication_year, current_price, publisher_id
+        or None
+        """
+        return await self._pool.fetchrow(self._book_sql("book_id = $1"), book_id)
+
+    async def get_book_by_isbn(self, isbn):
+        """
+        :param isbn: the isbn of the book
+        :returns: record of book_id, current_price of the book with the smallest id that has the isbn, or None
+        """
+        return await self._pool.fetchrow(f"""
+            select book_id, current_price from {self._table("book")} where isbn = $1 order by book_id limit 1
+        """, isbn)
+
+    async def get_book_authors(self, book_id):
+        """
+        :param book_id: the database id of the book
+        :returns: [record of book_id, author_id, name, role] of the book, in the order of the authors
+        """
+        return await self._pool.fetch(self._book_authors_sql("book_id = $1"), book_id)
+
+    async def get_book_reviews(self, book_id):
+        """
+        :param book_id: the database id of the book
+        :returns: [record of book_id, review_id, created, nickname, score, text] of the book
+        """
+        return await self._pool.fetch(self._reviews_sql("book_id = $1"), book_id)
+
+    @staticmethod
+    def _details(row):
+        """
+        :param row: record of the _book_details_sql query
+        :returns: {"book": tuple of the book columns, "authors": [dict], "reviews": [dict]}
+        """
+        return {"book": tuple(row.values())[:-2], "authors": json.loads(row["authors"]),
+                "reviews": json.loads(row["reviews"])}
+
+    async def get_book_details(self, book_id):
+        """
+        Reads a book along with its authors and reviews with a single query.
+        :param book_id: the database id of the book
+        :returns: {"book": tuple, "authors": [dict], "reviews": [dict]}, None if the book does not exist, the
+        tuple has the columns of get_book, the dicts the columns of get_book_authors and get_book_reviews
+        """
+        row = await self._pool.fetchrow(self._book_details_sql("book_id = $1"), book_id)
+        return self._details(row) if row is not None else None
+
+    async def get_books_details(self, book_ids):
+        """
+        Reads many books along with their authors and reviews with a single query.
+        :param book_ids: iterable of database book ids
+        :returns: {book_id: {"book": tuple, "authors": [dict], "reviews": [dict]}} of the books that exist
+        """
+        rows = await self._pool.fetch(self._book_details_sql("book_id = any($1::bigint[])"), list(book_ids))
+        return {row["book_id"]: self._details(row) for row in rows}
+
+    async def insert_reviews(self, book_id, reviews):
+        """
+        Inserts reviews of a book in a single transaction.
+        :param book_id: the database id of the book
+        :param reviews: iterable of database.entities.Review, created must be a datetime or None
+        :returns: list of the ids of the new reviews
+        """
+        reviews = list(reviews)
+        columns = ([review.created for review in reviews], [review.nickname or "anonymous" for review in reviews],
+                   [review.score for review in reviews], [review.text for review in reviews])
+        async with self._pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                if self._review_partition_size:
+                    rows = await conn.fetch(f"""
+                        insert into {self._table("review")}(book_id, created, nickname, score, text)
+                        select $1, * from unnest($2::timestamptz[], $3::varchar[], $4::smallint[], $5::text[])
+                        returning review_id
+                    """, book_id, *columns)
+                else:
+                    rows = await conn.fetch(f"""
+                        insert into {self._table("review")}(created, nickname, score, text)
+                        select * from unnest($1::timestamptz[], $2::varchar[], $3::smallint[], $4::text[])
+                        returning review_id
+                    """, *columns)
+                review_ids = [row["review_id"] for row in rows]
+                await conn.execute(f"""
+                    insert into {self._table("book_review")}(book_id, review_id)
+                    select $1, unnest($2::bigint[])
+                """, book_id, review_ids)
+            except BaseException:
+                await transaction.rollback()
+                raise
+            await self._commit(transaction, 2 * len(review_ids))
+        return review_ids
+
+    async def insert_rows(self, table, columns, rows):
+        """
+        Copies the rows into the table in a single transaction, e.g. the rows of the database.factories row
+        generators.
+        :param table: the table name, without the prefix
+        :param columns: the column names of the values in each row
+        :param rows: iterable of tuples
+        """
+        rows = list(rows)
+        async with self._pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                await conn.copy_records_to_table(f"{self.table_prefix}{table}", records=rows, columns=list(columns),
+                                                 schema_name=self.schema)
+            except BaseException:
+                await transaction.rollback()
+                raise
+            await self._commit(transaction, len(rows))
+
+    async def replace_order(self, user_id, order_id, items):
+        """
+        Same as ComicBooksDBManager.replace_order, the books are given by their database ids.
+        :param user_id: the id of the user
+        :param order_id: the id of the order that is replaced
+        :param items: iterable of (book_id, quantity), book ids must be unique
+        :returns: the id of the new order or None if the user does not have the order
+        """
+        items = list(items)
+        async with self._pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                locked = await conn.fetchval(self._replace_order_lock_sql(), user_id, order_id)
+                if locked is None:
+                    await transaction.rollback()
+                    return None
+                new_order_id = await conn.fetchval(self._replace_order_sql(), user_id, order_id,
+                                                   [book_id for book_id, _ in items],
+                                                   [quantity for _, quantity in items])
+            except BaseException:
+                await transaction.rollback()
+                raise
+            await self._commit(transaction, 1 + len(items))
+            return new_order_id
+
+    @classmethod
+    async def create(cls, database, password, user="postgres", host="localhost", port="5432",
+                     review_partition_size=None, schema=None, table_prefix=None, min_size=None, max_size=None,
+                     commit_policy=None):
+        """
+        :param database: database name
+        :param password: password for the specified database user
+        :param user: database user - defaults to postgres
+        :param host: host ip - defaults to localhost
+        :param port: connection port - defaults to 5432
+        :param review_partition_size: book ids per review partition, detected from the review table if None
+        :param schema: the schema of the tables, defaults to ComicBooksDBManager.DEFAULT_SCHEMA
+        :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+        :param min_size: connections opened when the pool is created, defaults to POOL_MIN_SIZE
+        :param max_size: maximum connections of the pool, defaults to POOL_MAX_SIZE
+        :param commit_policy: CommitPolicy of the write paths, defaults to one commit per write path
+        :rtype: AsyncComicBooksDBManager
+        """
+        db_manager = cls(schema=schema, table_prefix=table_prefix, review_partition_size=review_partition_size,
+                         commit_policy=commit_policy)
+        db_manager._pool = await asyncpg.create_pool(database=database, password=password, user=user, host=host,
+                                                     port=int(port), min_size=min_size or cls.POOL_MIN_SIZE,
+                                                     max_size=max_size or cls.POOL_MAX_SIZE,
+                                                     init=db_manager._configure)
+        if review_partition_size is None:
+            row = await db_manager._pool.fetchrow(db_manager._review_partition_size_sql())
+            db_manager._review_partition_size = db_manager._review_partition_size_from_bounds(row)
+        return db_manager
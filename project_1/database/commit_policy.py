@@ -0,0 +1,132 @@
+"""Policy that decides when the write paths of ComicBooksDBManager commit"""
+import threading
+import time
+
+
+class CommitPolicy(object):
+    """
+    Commits the transaction of a connection every N written rows and/or every T seconds, and always when a
+    write path completes. Bulk sessions can disable synchronous commit, so a commit does not wait for its WAL
+    flush; a crash can then lose the last commits, but it cannot corrupt the database. DDL is committed at
+    once, regardless of the thresholds. The number and the latency of the commits are recorded. The policy
+    can be shared by connections used from several threads.
+    """
+
+    def __init__(self, every_rows=None, every_seconds=None, synchronous_commit=True):
+        """
+        :param every_rows: commit once at least this many rows have been written since the last commit
+        :param every_seconds: commit once at least this many seconds have passed since the last commit
+        :param synchronous_commit: if False the connections are configured with synchronous_commit off
+        If neither every_rows nor every_seconds is given, each write path commits once, when it completes.
+        """
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.synchronous_commit = synchronous_commit
+        self._lock = threading.Lock()
+        # {connection: [rows written since the last commit, time of the last commit]}
+        self._pending = {}
+        self._latencies = []
+        self._ddl_commits = 0
+        self._rows = 0
+
+    def __str__(self):
+        return (f"CommitPolicy(every_rows={self.every_rows}, every_seconds={self.every_seconds}, "
+                f"synchronous_commit={self.synchronous_commit})")
+
+    def session_statements(self):
+        """
+        :returns: list of the statements that apply the session settings of the policy to a connection
+        """
+        return [] if self.synchronous_commit else ["set synchronous_commit to off"]
+
+    def configure(self, conn):
+        """
+        Applies the session settings of the policy to a new connection.
+        :param conn: psycopg2 connection
+        """
+        statements = self.session_statements()
+        if statements:
+            with conn.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+            conn.commit()
+
+    def _pending_state(self, conn):
+        with self._lock:
+            return self._pending.setdefault(conn, [0, time.perf_counter()])
+
+    def rows_written(self, conn, rows=1):
+        """
+        Records rows written in the current transaction of the connection and commits if they are due.
+        :param conn: psycopg2 connection
+        :param rows: number of rows written
+        :returns: True if the transaction was committed
+        """
+        state = self._pending_state(conn)
+        state[0] += rows
+        if self.every_rows is not None and state[0] >= self.every_rows:
+            self.commit(conn)
+            return True
+        if self.every_seconds is not None and time.perf_counter() - state[1] >= self.every_seconds:
+            self.commit(conn)
+            return True
+        return False
+
+    def commit(self, conn, rows=0):
+        """
+        Commits the transaction of the connection and records its latency.
+        :param conn: psycopg2 connection
+        :param rows: rows written in the transaction that were not recorded with rows_written, e.g. by a
+        write path that has to be atomic
+        """
+        start = time.perf_counter()
+        conn.commit()
+        end = time.perf_counter()
+        state = self._pending_state(conn)
+        with self._lock:
+            self._latencies.append(end - start)
+            self._rows += state[0] + rows
+            state[0], state[1] = 0, end
+
+    def commit_ddl(self, conn):
+        """
+        Commits the DDL of the connection at once, so the catalog changes are visible to the other connections
+        and their locks are released, and records the commit.
+        :param conn: psycopg2 connection
+        """
+        self.commit(conn)
+        with self._lock:
+            self._ddl_commits += 1
+
+    def record_commit(self, seconds, rows=0):
+        """
+        Records a commit executed by the caller, e.g. the commit of an asyncpg transaction.
+        :param seconds: the latency of the commit
+        :param rows: rows written in the committed transaction
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+            self._rows += rows
+
+    def forget(self, conn):
+        """
+        Drops the state of a connection that is closed.
+        :param conn: psycopg2 connection
+        """
+        with self._lock:
+            self._pending.pop(conn, None)
+
+    def statistics(self):
+        """
+        :returns: {"commits": int, "ddl_commits": int, "rows": int, "total_s": float, "mean_ms": float,
+                   "max_ms": float}
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            ddl_commits = self._ddl_commits
+            rows = self._rows
+        if not latencies:
+            return {"commits": 0, "ddl_commits": ddl_commits, "rows": rows, "total_s": 0.0, "mean_ms": None,
+                    "max_ms": None}
+        return {"commits": len(latencies), "ddl_commits": ddl_commits, "rows": rows, "total_s": sum(latencies),
+                "mean_ms": 1000 * sum(latencies) / len(latencies), "max_ms": 1000 * max(latencies)}
@@ -1,11 +1,22 @@
 import functools
+import io
+import itertools
+import os
 import random
+import re
+import time
+import uuid
 
 import psycopg2
 from psycopg2.extras import execute_values
 
+from project_1.database.commit_policy import CommitPolicy
+from project_1.database.entities import (Author, Book, Publisher, Review, User, Address, UserAddress, Order,
+                                         BookOrder)
 from project_1.database.factories import (MiscMixin, UserFactory, AddressFactory,
                                           UserAddressFactory, BookOrderFactory, OrderFactory, FakeGenerator)
+from project_1.database.load_scheduler import LoadScheduler, catalog_dependencies
+from project_1.database.lookup_cache import LRUCache
 
 
 def safe_connection(error_msg=None):
@@ -25,127 +36,831 @@ def safe_connection(error_msg=None):
     return _safe_connection
 
 
-class ComicBooksDBManager(object):
+def _copy_text(value):
+    """
+    :param value: a column value
+    :returns: the value in the text format of COPY
+    """
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class ComicBooksSQLMixin(object):
+    """
+    Names the tables and builds the statements shared by ComicBooksDBManager and
+    database.async_database_manager.AsyncComicBooksDBManager, and names the tables for the benchmarks that
+    run their own statements. The classes that use it set the review partition size. The parameters of the
+    write statements are referenced as $1, $2 ..., like the server side prepared statements and asyncpg do,
+    the read statements take their filter with the placeholder of the driver.
+    """
+    DEFAULT_SCHEMA = "public"
+    DEFAULT_TABLE_PREFIX = "2016_"
+    DEFAULT_REVIEW_PARTITION_SIZE = 10000
+    # number of book ids per review partition, None when the review tables are not partitioned
+    _review_partition_size = None
+
+    def __init__(self, schema=None, table_prefix=None):
+        """
+        :param schema: the schema of the tables, defaults to DEFAULT_SCHEMA
+        :param table_prefix: the prefix of the table names, defaults to DEFAULT_TABLE_PREFIX
+        """
+        self.schema = schema if schema else self.DEFAULT_SCHEMA
+        self.table_prefix = table_prefix if table_prefix is not None else self.DEFAULT_TABLE_PREFIX
+
+    def table_name(self, name):
+        """
+        :param name: table or sequence name without the prefix
+        :returns: the quoted prefixed name qualified with the schema, to be used in a statement
+        """
+        return self._table(name)
+
+    def _name(self, name):
+        """
+        :param name: table, sequence or constraint name without the prefix
+        :returns: the quoted prefixed name
+        """
+        return f'"{self.table_prefix}{name}"'
+
+    def _table(self, name):
+        """
+        :param name: table or sequence name without the prefix
+        :returns: the quoted prefixed name qualified with the schema
+        """
+        return f'"{self.schema}".{self._name(name)}'
+
+    def _review_partition_size_sql(self):
+        """
+        :returns: query of the bounds of a partition of the review table, no rows if the table is not
+        partitioned and a null bound if it has no partitions yet
+        """
+        review_table = self._table("review").replace("'", "''")
+        return f"""
+            select pg_get_expr(child.relpartbound, child.oid)
+            from pg_partitioned_table as pt
+                left join pg_inherits as i on i.inhparent = pt.partrelid
+                left join pg_class as child on child.oid = i.inhrelid
+            where pt.partrelid = to_regclass('{review_table}')
+            limit 1
+        """
+
+    @classmethod
+    def _review_partition_size_from_bounds(cls, row):
+        """
+        :param row: the row of the _review_partition_size_sql query or None
+        :returns: the number of book ids of the existing partitions, DEFAULT_REVIEW_PARTITION_SIZE if the table
+        is partitioned but has no partitions yet, None if the table is not partitioned
+        """
+        if row is None:
+            return None
+        bounds = re.search(r"FROM \('?(\d+)'?\) TO \('?(\d+)'?\)", row[0] or "")
+        return int(bounds.group(2)) - int(bounds.group(1)) if bounds else cls.DEFAULT_REVIEW_PARTITION_SIZE
+
+    def _book_sql(self, book_filter):
+        """
+        :param book_filter: condition on the book_id column of the book table
+        :returns: query of (book_id, isbn, title, description, publication_year, current_price, publisher_id)
+        """
+        return f"""
+            select book_id, isbn, title, description, publication_year, current_price, publisher_id
+            from {self._table("book")} where {book_filter}
+        """
+
+    def _book_authors_sql(self, book_filter):
+        """
+        :param book_filter: condition on the book_id column of the book_author table
+        :returns: query of (book_id, author_id, name, role), in the order of the books and their authors
+        """
+        return f"""
+            select ba.book_id, a.author_id, a.name, ba.role
+            from {self._table("author")} as a, {self._table("book_author")} as ba
+            where ba.{book_filter} and a.author_id = ba.author_id
+            order by ba.book_id, ba.author_ordinal
+        """
+
+    def _reviews_sql(self, book_filter):
+        """
+        :param book_filter: condition on the book_id column of the book_review table, or of the partitioned
+        review table, whose partition key is part of the filter so only the partition of the book is scanned
+        :returns: query of (book_id, review_id, created, nickname, score, text)
+        """
+        if self._review_partition_size:
+            return f"""
+                select book_id, review_id, created, nickname, score, text
+                from {self._table("review")} where {book_filter}
+            """
+        return f"""
+            select br.book_id, r.review_id, r.created, r.nickname, r.score, r.text
+            from {self._table("review")} as r, {self._table("book_review")} as br
+            where br.{book_filter} and r.review_id = br.review_id
+        """
+
+    def _book_details_sql(self, book_filter):
+        """
+        :param book_filter: condition on the book_id column of the book table
+        :returns: query of the book columns of _book_sql along with the json arrays authors and reviews of the
+        rows of _book_authors_sql and _reviews_sql, so a book and its relations are read in one round trip
+        """
+        # an aggregate over an ordered subquery keeps the order of its rows
+        return f"""
+            select b.*,
+                (select coalesce(json_agg(a), '[]') from ({self._book_authors_sql("book_id = b.book_id")}) as a)
+                    as authors,
+                (select coalesce(json_agg(r), '[]') from ({self._reviews_sql("book_id = b.book_id")}) as r)
+                    as reviews
+            from ({self._book_sql(book_filter)}) as b
+        """
+
+    def _replace_order_lock_sql(self):
+        """
+        :returns: statement that locks the order $2 of the user $1 and selects its id
+        """
+        return f"""
+            select order_id from {self._table("order")} where user_id = $1 and order_id = $2 for update
+        """
+
+    def _replace_order_sql(self):
+        """
+        :returns: statement that replaces the order $2 of the user $1 with a new order of the books $3 in the
+        quantities $4, keeping its addresses, and selects the id of the new order
+        """
+        return f"""
+            with old_items as (delete from {self._table("book_order")} where order_id = $2),
+                old_order as (delete from {self._table("order")} where user_id = $1 and order_id = $2
+                              returning user_id, billing_address_id, shipping_address_id),
+                new_order as (insert into {self._table("order")}
+                                  (user_id, billing_address_id, shipping_address_id, placement)
+                              select user_id, billing_address_id, shipping_address_id, now() from old_order
+                              returning order_id),
+                new_items as (insert into {self._table("book_order")} (book_id, order_id, quantity)
+                              select i.book_id, new_order.order_id, i.quantity
+                              from new_order, unnest($3::bigint[], $4::integer[]) as i(book_id, quantity))
+            select order_id from new_order
+        """
+
+    def __str__(self):
+        return f"ComicBooksSQLMixin(schema={self.schema}, prefix={self.table_prefix})"
+
+
+class ComicBooksDBManager(ComicBooksSQLMixin):
     """DB Wrapper for the comic books database"""
+    LOAD_WORKERS = 4
+    COPY_CHUNK_SIZE = 50000
+    # text search configuration of the full text search columns
+    SEARCH_CONFIGURATION = "english"
+    # columns of the staging tables used by insert_parsed_data
+    STAGING_TABLES = {
+        "author": """
+            goodreads_author_id character varying not null,
+            gender character varying(6),
+            name character varying not null,
+            nationality character varying,
+            author_id bigint default nextval('{author_id_seq}'::regclass) not null
+        """,
+        "book": """
+            goodreads_book_id character varying not null,
+            isbn character(10) not null,
+            current_price numeric(6,2),
+            description text,
+            publication_year character(4),
+            title character varying(200),
+            publisher_id bigint,
+            book_id bigint default nextval('{book_id_seq}'::regclass) not null
+        """,
+        "publisher": """
+            goodreads_book_id character varying not null,
+            name character varying not null,
+            phone_number character varying,
+            address_id bigint,
+            publisher_id bigint default nextval('{publisher_id_seq}'::regclass) not null
+        """,
+        "book_author": """
+            goodreads_book_id character varying not null,
+            goodreads_author_id character varying not null,
+            author_ordinal smallint not null,
+            role character varying
+        """,
+        "review": """
+            goodreads_book_id character varying not null,
+            created character varying,
+            nickname character varying,
+            score smallint not null,
+            text text not null,
+            review_id bigint default nextval('{review_id_seq}'::regclass) not null
+        """
+    }
 
-    def __init__(self):
+    SCHEMA_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "2016_schema.sql")
+    LOOKUP_CACHE_SIZE = 10000
+
+    def __init__(self, schema=None, table_prefix=None, lookup_cache_size=None, commit_policy=None):
+        """
+        :param schema: the schema of the tables, defaults to DEFAULT_SCHEMA
+        :param table_prefix: the prefix of the table names, defaults to DEFAULT_TABLE_PREFIX
+        :param lookup_cache_size: maximum entries of each lookup cache, defaults to LOOKUP_CACHE_SIZE
+        :param commit_policy: CommitPolicy of the write paths, defaults to one commit per write path
+        """
+        super(ComicBooksDBManager, self).__init__(schema=schema, table_prefix=table_prefix)
         self._conn = None
         self._cursor = None
-        self._author_id_mapper = {}
+        self._conn_params = {}
+        self._prepared_statements = set()
+        self.commit_policy = commit_policy if commit_policy else CommitPolicy()
+        lookup_cache_size = lookup_cache_size if lookup_cache_size else self.LOOKUP_CACHE_SIZE
+        # isbn -> (book_id, current_price) and author name -> (author_id, ...)
+        self._book_cache = LRUCache(lookup_cache_size)
+        self._author_cache = LRUCache(lookup_cache_size)
 
     def __str__(self):
-        return f"ComicBooksDBManager(db_id={id(self._conn)})"
+        return f"ComicBooksDBManager(db_id={id(self._conn)}, schema={self.schema}, prefix={self.table_prefix})"
 
     def close(self):
         self._cursor.close()
         self._conn.close()
+        self.commit_policy.forget(self._conn)
 
-    def insert_parsed_data(self, author_data, book_data):
+    def create_schema(self):
         """
-        Inserts all parsed data into the database.
+        Creates the schema, if it does not exist, and (re)creates all the tables in it, using the table
+        definitions of sql/2016_schema.sql with the schema and table prefix of the manager.
+        """
+        with open(self.SCHEMA_FILE_PATH) as fin:
+            ddl = fin.read()
+        # the constraints of book_order are the only names of the dump without the 2016_ prefix
+        ddl = re.sub(r"CONSTRAINT (IF EXISTS )?book_order_(\w+)",
+                     rf'CONSTRAINT \1"{self.table_prefix}book_order_\2"', ddl)
+        ddl = ddl.replace('public."2016_', f'"{self.schema}"."{self.table_prefix}')
+        ddl = ddl.replace('"2016_', f'"{self.table_prefix}')
+        # the dump clears the search path of the session, the statements are schema qualified anyway
+        ddl = "\n".join(line for line in ddl.splitlines() if "set_config('search_path'" not in line)
+        self._cursor.execute(f"""create schema if not exists "{self.schema}" """)
+        self._cursor.execute(ddl)
+        self.commit_policy.commit_ddl(self._conn)
+        self.invalidate_lookup_caches()
+
+    def _connect(self):
+        """
+        Opens a new connection to the database of the manager, used by the methods that work in parallel.
+        :rtype: psycopg2.extensions.connection
+        """
+        conn = psycopg2.connect(**self._conn_params)
+        self.commit_policy.configure(conn)
+        return conn
+
+    def insert_parsed_data(self, author_data, book_data, review_data=(), parallel=False):
+        """
+        Inserts all parsed data into the database. The data are copied, along with their goodreads ids, into
+        unlogged staging tables and the database ids and relations are resolved on the server with set based
+        inserts, so the data can be loaded into non empty tables and concurrently with other loads.
         :param author_data: {"author_id": database.entities.Author}
         :param book_data: {book_id: {"book": "database.entities.Book",
                            "book_authors": {author_id: database.entities.BookAuthor},
                            "author_ordinal": int, "reviews": [database.entities.Review],
-                           "publisher": database.entities.Publisher}
+                           "publisher": database.entities.Publisher}, the reviews are optional
+        :param review_data: iterable of (book_id, database.entities.Review), copied along with the reviews of
+        book_data, e.g. the rows of parser.parser.UCSDJsonDataParser.get_parsed_review_data
+        :param parallel: if True the tables are resolved by a LoadScheduler, independent tables concurrently
+        and each one in its own transaction, otherwise one after the other in a single transaction
+        :returns: {table: {"start_s": float, "seconds": float}} timings of the resolution of each table
         """
-        self._insert_authors(author_data)
-        self._insert_relations(book_data)
+        self.invalidate_lookup_caches()
+        staging = self._create_staging_tables()
+        try:
+            self._copy_staging_data(staging, author_data, book_data, review_data)
+            if parallel:
+                return self._schedule_staging_data(staging)
+            return self._resolve_staging_data(staging)
+        finally:
+            self._drop_staging_tables(staging)
+
+    def _create_staging_tables(self):
+        """
+        Creates the staging tables of a load. Each load uses its own tables, whose ids default to the
+        sequences of the final tables, so the ids are reserved while copying.
+        :returns: {staging table name: quoted table identifier}
+        """
+        load_id = uuid.uuid4().hex[:12]
+        staging = {name: self._table(f"stage_{load_id}_{name}") for name in self.STAGING_TABLES}
+        sequences = {f"{name}_id_seq": self._table(f"{name}_{name}_id_seq")
+                     for name in ("author", "book", "publisher", "review")}
+        for name, columns in self.STAGING_TABLES.items():
+            self._cursor.execute(f"""create unlogged table {staging[name]} ({columns.format(**sequences)})""")
+        self.commit_policy.commit_ddl(self._conn)
+        return staging
 
-    def _insert_authors(self, author_data):
+    def _drop_staging_tables(self, staging):
+        """
+        :param staging: {staging table name: quoted table identifier}
         """
-        Inserts all the authors provided in the data
+        self._conn.rollback()
+        for table in staging.values():
+            self._cursor.execute(f"""drop table if exists {table}""")
+        self.commit_policy.commit_ddl(self._conn)
+
+    def _copy_rows(self, table, columns, rows):
+        """
+        Copies the rows into the table, in chunks of COPY_CHUNK_SIZE rows.
+        :param table: quoted table identifier
+        :param columns: the column names of the values in each row
+        :param rows: iterable of lists or tuples
+        """
+        sql = f"""copy {table}({", ".join(columns)}) from stdin"""
+        rows = iter(rows)
+        for chunk in iter(lambda: list(itertools.islice(rows, self.COPY_CHUNK_SIZE)), []):
+            buffer = io.StringIO()
+            for row in chunk:
+                buffer.write("\t".join(map(_copy_text, row)))
+                buffer.write("\n")
+            buffer.seek(0)
+            self._cursor.copy_expert(sql, buffer)
+            # the staging tables are dropped when a load fails, so their partial copies can be committed
+            self.commit_policy.rows_written(self._conn, len(chunk))
+
+    def _copy_staging_data(self, staging, author_data, book_data, review_data=()):
+        """
+        Copies the parsed data into the staging tables and analyzes them.
+        :param staging: {staging table name: quoted table identifier}
         :param author_data: {"author_id": database.entities.Author}
+        :param book_data: described in insert_parsed_data
+        :param review_data: described in insert_parsed_data
+        """
+        self._copy_rows(staging["author"], ("goodreads_author_id", *Author.COLUMNS),
+                        ((author_id, *author.to_row()) for author_id, author in author_data.items()))
+        self._copy_rows(staging["book"], ("goodreads_book_id", *Book.COLUMNS),
+                        ((book_id, *data["book"].to_row()) for book_id, data in book_data.items()))
+        self._copy_rows(staging["publisher"], ("goodreads_book_id", *Publisher.COLUMNS),
+                        ((book_id, *publisher.to_row())
+                         for book_id, data in book_data.items() if (publisher := data.get("publisher"))))
+        self._copy_rows(staging["book_author"], ("goodreads_book_id", "goodreads_author_id", "author_ordinal",
+                                                 "role"),
+                        ((book_id, author_id, book_author.ordinal, book_author.role)
+                         for book_id, data in book_data.items()
+                         for author_id, book_author in data.get("book_authors", {}).items()))
+        book_reviews = ((book_id, review) for book_id, data in book_data.items() for review in data.get("reviews", []))
+        self._copy_rows(staging["review"], ("goodreads_book_id", *Review.COLUMNS),
+                        ((book_id, *review.to_row()) for book_id, review in itertools.chain(book_reviews, review_data)))
+        # autovacuum does not analyze the new tables in time, the resolution joins need their row counts
+        for table in staging.values():
+            self._cursor.execute(f"""analyze {table}""")
+        self.commit_policy.commit(self._conn)
+
+    def _resolution_tasks(self, staging):
+        """
+        :param staging: {staging table name: quoted table identifier}
+        :returns: {table: function that takes a cursor and inserts the staged rows of the table}, in a valid load
+        order. When the reviews are partitioned, the partitions of the staged books are created and committed
+        first and each one gets its own review_p{n} task, which loads the review and the book_review partition.
+        """
+        queries = {
+            "author": f"""
+            insert into {self._table("author")}(author_id, gender, name, nationality)
+            select author_id, gender, name, nationality from {staging["author"]}
+            """,
+            "publisher": f"""
+            insert into {self._table("publisher")}(publisher_id, name, phone_number, address_id)
+            select publisher_id, name, phone_number, address_id from {staging["publisher"]}
+            """,
+            "book": f"""
+            insert into {self._table("book")}(book_id, isbn, current_price, description, publication_year, title,
+                                              publisher_id)
+            select b.book_id, b.isbn, b.current_price, b.description, b.publication_year, b.title,
+                coalesce(b.publisher_id, p.publisher_id)
+            from {staging["book"]} as b
+                left join {staging["publisher"]} as p on p.goodreads_book_id = b.goodreads_book_id
+            """,
+            "book_author": f"""
+            insert into {self._table("book_author")}(author_id, book_id, author_ordinal, role)
+            select a.author_id, b.book_id, ba.author_ordinal, ba.role
+            from {staging["book_author"]} as ba
+                join {staging["book"]} as b on b.goodreads_book_id = ba.goodreads_book_id
+                join {staging["author"]} as a on a.goodreads_author_id = ba.goodreads_author_id
+            """
+        }
+        if not self._review_partition_size:
+            queries["review"] = f"""
+            insert into {self._table("review")}(review_id, created, nickname, score, text)
+            select review_id, created::timestamp with time zone, coalesce(nickname, 'anonymous'), score, text
+            from {staging["review"]}
+            """
+            queries["book_review"] = f"""
+            insert into {self._table("book_review")}(book_id, review_id)
+            select b.book_id, r.review_id
+            from {staging["review"]} as r join {staging["book"]} as b on b.goodreads_book_id = r.goodreads_book_id
+            """
+        tasks = {table: lambda cursor, query=query: cursor.execute(query) for table, query in queries.items()}
+        if self._review_partition_size:
+            for partition in self._create_staged_review_partitions(staging):
+                tasks[f"review_p{partition}"] = (lambda cursor, partition=partition:
+                                                 self._insert_review_partition(cursor, staging, partition))
+        return tasks
+
+    def _resolve_staging_data(self, staging):
+        """
+        Inserts the staged data into the final tables one after the other, resolving the relations by joining
+        on the goodreads ids. All the tables, including the review partitions, are loaded in a single
+        transaction; only the empty review partitions are created and committed before it.
+        :param staging: {staging table name: quoted table identifier}
+        :returns: {table: {"start_s": float, "seconds": float}}
+        """
+        timings = {}
+        start = time.perf_counter()
+        for table, task in self._resolution_tasks(staging).items():
+            table_start = time.perf_counter()
+            task(self._cursor)
+            timings[table] = {"start_s": table_start - start, "seconds": time.perf_counter() - table_start}
+        self.commit_policy.commit(self._conn)
+        return timings
+
+    def _schedule_staging_data(self, staging):
+        """
+        Inserts the staged data into the final tables with a LoadScheduler, following the foreign keys of the
+        catalog, so e.g. the authors, the publishers and the reviews are inserted at the same time.
+        :param staging: {staging table name: quoted table identifier}
+        :returns: {table: {"start_s": float, "seconds": float}}
+        """
+        tasks = self._resolution_tasks(staging)
+        tables = {f"{self.table_prefix}{table}": table for table in tasks}
+        dependencies = catalog_dependencies(self._cursor, self.schema, tables)
+        self.commit_policy.commit(self._conn)
+        dependencies = {tables[table]: {tables[referenced] for referenced in referenced_tables}
+                        for table, referenced_tables in dependencies.items()}
+        # the review partitions only need their books, so they are loaded in parallel on separate connections
+        for partition_task in self._review_partition_tasks(tasks):
+            dependencies[partition_task].add("book")
+        return LoadScheduler(self._connect, dependencies, workers=self.LOAD_WORKERS,
+                             commit_policy=self.commit_policy).run(tasks)
+
+    def _review_partition(self, book_id):
+        """
+        :param book_id: the database id of a book
+        :returns: the number of the review partition that holds the reviews of the book
+        """
+        return (book_id - 1) // self._review_partition_size
+
+    def create_partitioned_review_tables(self, partition_size=None):
+        """
+        Recreates the review and book_review tables range partitioned by book_id. The reviews
+        also hold the id of their book, so the per book queries do not need to join with book_review
+        and only scan the partition of the book. Partitions are created on demand while loading the data.
+        Note that all the existing reviews are dropped. Managers created afterwards detect the partitioned
+        layout, so later loads keep using it.
+        :param partition_size: number of book ids that each partition covers, defaults to
+        DEFAULT_REVIEW_PARTITION_SIZE
+        """
+        partition_size = partition_size if partition_size else self.DEFAULT_REVIEW_PARTITION_SIZE
+        queries = [
+            f"""drop table if exists {self._table("book_review")} """,
+            f"""drop table if exists {self._table("review")} """,
+            f"""create sequence if not exists {self._table("review_review_id_seq")} """,
+            f"""
+            create table {self._table("review")} (
+                review_id bigint default nextval('{self._table("review_review_id_seq")}'::regclass) not null,
+                book_id bigint not null,
+                created timestamp with time zone,
+                nickname character varying default 'anonymous'::character varying not null,
+                score smallint not null,
+                text text not null,
+                constraint {self._name("review_pk")} primary key (book_id, review_id),
+                constraint {self._name("review_book_book_id_fk")} foreign key (book_id)
+                    references {self._table("book")}(book_id)
+            ) partition by range (book_id)
+            """,
+            f"""alter sequence {self._table("review_review_id_seq")} owned by {self._table("review")}.review_id""",
+            f"""
+            create table {self._table("book_review")} (
+                book_id bigint not null,
+                review_id bigint not null,
+                constraint {self._name("book_has_review_pk")} primary key (book_id, review_id),
+                constraint {self._name("book_has_review_book_book_id_fk")} foreign key (book_id)
+                    references {self._table("book")}(book_id),
+                constraint {self._name("book_has_review_review_review_id_fk")} foreign key (book_id, review_id)
+                    references {self._table("review")}(book_id, review_id)
+            ) partition by range (book_id)
+            """
+        ]
+        for query in queries:
+            self._cursor.execute(query)
+        self.commit_policy.commit_ddl(self._conn)
+        self._review_partition_size = partition_size
+
+    def _detect_review_partition_size(self):
+        """
+        Detects whether the review table has been partitioned by create_partitioned_review_tables, so the
+        loads and the queries use the layout of the existing tables.
+        :returns: the number of book ids of the existing partitions, DEFAULT_REVIEW_PARTITION_SIZE if the table
+        is partitioned but has no partitions yet, None if the table is not partitioned
+        """
+        self._cursor.execute(self._review_partition_size_sql())
+        row = self._cursor.fetchone()
+        self.commit_policy.commit(self._conn)
+        return self._review_partition_size_from_bounds(row)
+
+    def _create_review_partitions(self, partitions):
+        """
+        Creates the given review partitions, if they do not exist, and commits them, so the partitions can be
+        loaded concurrently from other connections.
+        :param partitions: iterable of partition numbers
         """
         sql = """
-                insert into "2016_author" (gender, name, nationality)
-                values %s
-                """
-        id_count = 1
-        values = []
-        for author_id, author_data in author_data.items():
-            # map the ids of the authors to the ids in the database
-            # so the relation book_author can be filled
-            self._author_id_mapper[author_id] = id_count
-            values.append(author_data.to_list())
-            id_count += 1
-        execute_values(cur=self._cursor, sql=sql, argslist=values)
-        self._conn.commit()
-
-    def _insert_relations(self, book_data):
-        """
-        Inserts all data from the book_data gathered along with their relations.
-        :param book_data: {book_id: {"book": "database.entities.Book",
-                           "book_authors": {author_id: database.entities.BookAuthor},
-                           "author_ordinal": int, "reviews": [database.entities.Review],
-                           "publisher": database.entities.Publisher}
+            create table if not exists {partition_table} partition of {table}
+            for values from ({lower}) to ({upper})
+        """
+        for partition in partitions:
+            lower = partition * self._review_partition_size + 1
+            upper = lower + self._review_partition_size
+            for table in ("review", "book_review"):
+                self._cursor.execute(sql.format(partition_table=self._table(f"{table}_p{partition}"),
+                                                table=self._table(table), lower=lower, upper=upper))
+        self.commit_policy.commit_ddl(self._conn)
+
+    def _create_staged_review_partitions(self, staging):
+        """
+        Creates the review partitions of the staged books.
+        :param staging: {staging table name: quoted table identifier}
+        :returns: range of the partition numbers of the staged books
+        """
+        self._cursor.execute(f"""select min(book_id), max(book_id) from {staging["book"]}""")
+        min_book_id, max_book_id = self._cursor.fetchone()
+        if min_book_id is None:
+            self.commit_policy.commit(self._conn)
+            return range(0)
+        partitions = range(self._review_partition(min_book_id), self._review_partition(max_book_id) + 1)
+        self._create_review_partitions(partitions)
+        return partitions
+
+    @staticmethod
+    def _review_partition_tasks(tasks):
+        """
+        :param tasks: the resolution tasks
+        :returns: list of the names of the review partition tasks
+        """
+        return [table for table in tasks if re.fullmatch(r"review_p\d+", table)]
+
+    def _insert_review_partition(self, cursor, staging, partition):
+        """
+        Inserts the staged reviews of a single partition directly into the review and book_review partition
+        tables, in the transaction of the cursor.
+        :param cursor: cursor of the connection that loads the partition
+        :param staging: {staging table name: quoted table identifier}
+        :param partition: the partition number
+        """
+        lower = partition * self._review_partition_size + 1
+        upper = lower + self._review_partition_size
+        staged_reviews = f"""
+            from {staging["review"]} as r join {staging["book"]} as b on b.goodreads_book_id = r.goodreads_book_id
+            where b.book_id >= {lower} and b.book_id < {upper}
+        """
+        cursor.execute(f"""
+            insert into {self._table(f"review_p{partition}")}(review_id, book_id, created, nickname, score, text)
+            select r.review_id, b.book_id, r.created::timestamp with time zone, coalesce(r.nickname, 'anonymous'),
+                r.score, r.text {staged_reviews}
+        """)
+        cursor.execute(f"""
+            insert into {self._table(f"book_review_p{partition}")}(book_id, review_id)
+            select b.book_id, r.review_id {staged_reviews}
+        """)
+
+    def get_book_reviews(self, book_id):
+        """
+        :param book_id: the database id of the book
+        :returns: [(book_id, review_id, created, nickname, score, text)] of the book
         """
+        self._cursor.execute(self._reviews_sql("book_id = %s"), (book_id,))
+        return self._cursor.fetchall()
 
-        pub_sql = """
-            insert into "2016_publisher"(name, phone_number, address_id) 
-            values (%s, %s, %s)
+    def get_book(self, book_id):
+        """
+        :param book_id: the database id of the book
+        :returns: (book_id, isbn, title, description, publication_year, current_price, publisher_id) or None
+        """
+        self._cursor.execute(self._book_sql("book_id = %s"), (book_id,))
+        return self._cursor.fetchone()
+
+    def get_book_id_range(self):
+        """
+        :returns: (min book_id, max book_id) of the loaded books, (None, None) if there are none
+        """
+        self._cursor.execute(f"""select min(book_id), max(book_id) from {self._table("book")}""")
+        return self._cursor.fetchone()
+
+    def get_book_details(self, book_id):
+        """
+        Reads a book along with its authors and reviews with a single query.
+        :param book_id: the database id of the book
+        :returns: {"book": tuple, "authors": [dict], "reviews": [dict]}, None if the book does not exist, the
+        tuple has the columns of get_book, the dicts the columns of get_book_authors and get_book_reviews
+        """
+        self._cursor.execute(self._book_details_sql("book_id = %s"), (book_id,))
+        row = self._cursor.fetchone()
+        if row is None:
+            return None
+        return {"book": row[:-2], "authors": row[-2], "reviews": row[-1]}
+
+    def get_book_authors(self, book_id):
+        """
+        :param book_id: the database id of the book
+        :returns: [(book_id, author_id, name, role)] of the book, in the order of the authors
+        """
+        self._cursor.execute(self._book_authors_sql("book_id = %s"), (book_id,))
+        return self._cursor.fetchall()
+
+    def create_search_indexes(self):
+        """
+        Adds stored tsvector columns, generated from the review text and the book title and description,
+        and GIN indexes on them. Adding the columns to loaded tables computes them for all the existing rows,
+        new rows get them on insert.
+        """
+        queries = [
+            f"""
+            alter table {self._table("review")} add column if not exists text_tsv tsvector
+                generated always as (to_tsvector('{self.SEARCH_CONFIGURATION}', text)) stored
+            """,
+            f"""
+            alter table {self._table("book")} add column if not exists search_tsv tsvector
+                generated always as (
+                    setweight(to_tsvector('{self.SEARCH_CONFIGURATION}', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('{self.SEARCH_CONFIGURATION}', coalesce(description, '')), 'B')
+                ) stored
+            """,
+            f"""
+            create index if not exists {self._name("review_text_tsv_index")}
+                on {self._table("review")} using gin (text_tsv)
+            """,
+            f"""
+            create index if not exists {self._name("book_search_tsv_index")}
+                on {self._table("book")} using gin (search_tsv)
             """
-        book_sql = """
-            insert into "2016_book"(isbn, current_price, description, publication_year, title, publisher_id) 
-                values (%s, %s, %s, %s, %s, %s)
-        """
-        review_sql = """
-            insert into "2016_review"(created, score, text)
-            values (%s, %s, %s)
-        """
-        book_author_sql = """
-            insert into "2016_book_author"(author_id, book_id, author_ordinal, role) 
-            values (%s, %s, %s, %s)
-        """
-        book_review_sql = """
-            insert into "2016_book_review"(book_id, review_id) 
-            values (%s, %s)
-        """
-        # initial id values
-        cur_book_id = 1
-        cur_pub_id = 1
-        cur_review_id = 0
-
-        for data in book_data.values():
-            book = data["book"]
-
-            # Publisher query
-            if publisher := data.get("publisher"):
-                self._cursor.execute(pub_sql, [publisher.name, publisher.phone_number, publisher.address])
-                book.publisher = cur_pub_id
-                cur_pub_id += 1
-            # Book query
-            self._cursor.execute(book_sql, [book.isbn, book.current_price, book.description,
-                                 book.publication_year, book.title, book.publisher])
-            # Author and Book Author query
-            if book_authors := data.get("book_authors"):
-                for author_id, book_author in book_authors.items():
-                    self._cursor.execute(book_author_sql, [self._author_id_mapper[author_id],
-                                                           cur_book_id, book_author.ordinal,
-                                                           book_author.role])
-            # Review and Book Review query
-            if reviews := data.get("reviews"):
-                for review in reviews:
-                    self._cursor.execute(review_sql, [review.created, review.score, review.text])
-                    cur_review_id += 1
-                    self._cursor.execute(book_review_sql, [cur_book_id, cur_review_id])
-            cur_book_id += 1
-            self._conn.commit()
+        ]
+        for query in queries:
+            self._cursor.execute(query)
+        self.commit_policy.commit_ddl(self._conn)
+
+    def drop_search_indexes(self):
+        """Drops the GIN indexes of create_search_indexes, the tsvector columns are kept"""
+        for name in ("review_text_tsv_index", "book_search_tsv_index"):
+            self._cursor.execute(f"""drop index if exists "{self.schema}".{self._name(name)}""")
+        self.commit_policy.commit_ddl(self._conn)
+
+    def search_reviews(self, query, limit=20, offset=0):
+        """
+        Full text search over the review texts, requires create_search_indexes.
+        :param query: web search syntax query, e.g. 'great art -boring'
+        :param limit: maximum number of results
+        :param offset: number of results skipped, for paging
+        :returns: [(review_id, book_id, score, rank)] ordered by descending rank
+        """
+        sql = f"""
+            select r.review_id, br.book_id, r.score, ts_rank(r.text_tsv, q) as rank
+            from {self._table("review")} as r
+                join {self._table("book_review")} as br on br.review_id = r.review_id,
+                websearch_to_tsquery('{self.SEARCH_CONFIGURATION}', %s) as q
+            where r.text_tsv @@ q
+            order by rank desc, r.review_id
+            limit %s offset %s
+        """
+        self._cursor.execute(sql, (query, limit, offset))
+        return self._cursor.fetchall()
+
+    def search_books(self, query, limit=20, offset=0):
+        """
+        Full text search over the book titles and descriptions, title matches rank higher. Requires
+        create_search_indexes.
+        :param query: web search syntax query, e.g. '"alan moore" watchmen'
+        :param limit: maximum number of results
+        :param offset: number of results skipped, for paging
+        :returns: [(book_id, isbn, title, rank)] ordered by descending rank
+        """
+        sql = f"""
+            select b.book_id, b.isbn, b.title, ts_rank(b.search_tsv, q) as rank
+            from {self._table("book")} as b, websearch_to_tsquery('{self.SEARCH_CONFIGURATION}', %s) as q
+            where b.search_tsv @@ q
+            order by rank desc, b.book_id
+            limit %s offset %s
+        """
+        self._cursor.execute(sql, (query, limit, offset))
+        return self._cursor.fetchall()
+
+    def get_book_by_isbn(self, isbn, cursor=None):
+        """
+        Read through lookup of a book, cached by isbn. Books that are not found are not cached.
+        :param isbn: the isbn of the book
+        :param cursor: cursor that runs the query on a miss, defaults to the cursor of the manager
+        :returns: (book_id, current_price) of the book with the smallest id that has the isbn, or None
+        """
+        book = self._book_cache.get(isbn)
+        if book is None:
+            cursor = cursor if cursor else self._cursor
+            cursor.execute(f"""
+                select book_id, current_price from {self._table("book")} where isbn = %s order by book_id limit 1
+            """, (isbn,))
+            book = cursor.fetchone()
+            if book is not None:
+                self._book_cache.put(isbn, book)
+        return book
+
+    def get_author_ids(self, name, cursor=None):
+        """
+        Read through lookup of the authors with the given name. Names that are not found are not cached.
+        :param name: the name of the author
+        :param cursor: cursor that runs the query on a miss, defaults to the cursor of the manager
+        :returns: tuple of the ids of the authors with the name, in ascending order
+        """
+        author_ids = self._author_cache.get(name)
+        if author_ids is None:
+            cursor = cursor if cursor else self._cursor
+            cursor.execute(f"""
+                select author_id from {self._table("author")} where name = %s order by author_id
+            """, (name,))
+            author_ids = tuple(author_id for author_id, in cursor.fetchall())
+            if author_ids:
+                self._author_cache.put(name, author_ids)
+        return author_ids
+
+    def warm_lookup_caches(self, cursor=None):
+        """
+        Fills the lookup caches with one bulk query each, up to their maximum size, with the books and the
+        authors that have the smallest ids. The warm up is not counted in the hits and misses.
+        :param cursor: cursor that runs the queries, in a transaction of its caller, defaults to the cursor of
+        the manager, whose transaction is committed
+        """
+        own_cursor = cursor is None
+        cursor = self._cursor if own_cursor else cursor
+        cursor.execute(f"""
+            select isbn, book_id, current_price
+            from (select distinct on (isbn) isbn, book_id, current_price from {self._table("book")}
+                  order by isbn, book_id) as b
+            order by book_id limit %s
+        """, (self._book_cache.max_size,))
+        for isbn, book_id, current_price in reversed(cursor.fetchall()):
+            self._book_cache.put(isbn, (book_id, current_price))
+        cursor.execute(f"""
+            select name, array_agg(author_id order by author_id) from {self._table("author")}
+            group by name order by min(author_id) limit %s
+        """, (self._author_cache.max_size,))
+        for name, author_ids in reversed(cursor.fetchall()):
+            self._author_cache.put(name, tuple(author_ids))
+        if own_cursor:
+            self.commit_policy.commit(self._conn)
+
+    def invalidate_lookup_caches(self, books=True, authors=True):
+        """
+        Drops the cached lookups, called by the methods that insert, update or delete books or authors.
+        :param books: if True the isbn lookups are dropped
+        :param authors: if True the author name lookups are dropped
+        """
+        if books:
+            self._book_cache.clear()
+        if authors:
+            self._author_cache.clear()
+
+    def _update_book_price(self, book_id, price):
+        """
+        Updates the price of a book and the cached lookup of its isbn, if the book is the cached one.
+        :param book_id: the database id of the book
+        :param price: the new price
+        """
+        self._cursor.execute(f"""
+            update {self._table("book")} set current_price = %s where book_id = %s returning isbn, current_price
+        """, (price, book_id))
+        row = self._cursor.fetchone()
+        if row is None:
+            return
+        isbn, current_price = row
+        cached = self._book_cache.peek(isbn)
+        if cached is not None and cached[0] == book_id:
+            self._book_cache.put(isbn, (book_id, current_price))
+
+    def invalidate_book(self, isbn):
+        """
+        Drops the cached lookup of a single isbn, for callers that update a book outside the manager.
+        :param isbn: the isbn of the book
+        """
+        self._book_cache.invalidate(isbn)
+
+    def lookup_cache_statistics(self):
+        """
+        :returns: {"books": LRUCache.statistics(), "authors": LRUCache.statistics()}
+        """
+        return {"books": self._book_cache.statistics(), "authors": self._author_cache.statistics()}
 
     @safe_connection("Error in executing commit method")
     def commit(self):
         """Commit the changes to the database"""
-        self._conn.commit()
+        self.commit_policy.commit(self._conn)
 
     def truncate_tables(self):
-        sql = """select table_name from information_schema.tables where table_schema = 'public'"""
-        self._cursor.execute(sql)
-        for table_name in self._cursor.fetchall():
+        sql = """
+            select table_name from information_schema.tables
+            where table_schema = %s and starts_with(table_name, %s)
+        """
+        self._cursor.execute(sql, (self.schema, self.table_prefix))
+        for table_name, in self._cursor.fetchall():
             self._truncate_table(table_name)
-        self._conn.commit()
+        self.commit_policy.commit_ddl(self._conn)
+        self.invalidate_lookup_caches()
 
     def _truncate_table(self, table_name):
-        sql = """truncate "%s" restart identity cascade""" % table_name
+        sql = """truncate "%s"."%s" restart identity cascade""" % (self.schema, table_name)
         self._cursor.execute(sql)
 
     @safe_connection("Error in executing create test data method")
@@ -155,89 +870,134 @@ class ComicBooksDBManager(object):
         If you want to restore their price to its previous value you will have to turn the first
         (user_num x order_per_user) book ids back to null manually. For simplicity it is assumed that
         the user always buys the same book in his order x  book_order_per_user times and that his
-        billing address is the same as his shipping address.
+        billing address is the same as his shipping address. The test data are created in a single
+        transaction, regardless of the row threshold of the commit policy.
 
         :param user_num: number of Fake users to be created
         :param order_per_user: number of Fake orders per user
         :param address_per_user: number of Fake addresses per user
         """
-        book_sql = """update "2016_book" set current_price=%s where book_id=%s"""
-        user_sql = """
-           insert into "2016_user"(username, password, phone_number, email, real_name)
-           values %s
-        """
-        address_sql = """
-           insert into "2016_address"(address_name, address_number, city, country, postal_code)
-           values %s
-        """
-        user_address_sql = """
-           insert into "2016_user_address"(address_id, user_id, is_physical, is_shipping, is_billing, is_active) 
-           values %s
-        """
-        book_order_sql = """
-           insert into "2016_book_order"(book_id, order_id, quantity) 
-           values %s
-        """
-        order_sql = """
-           insert into "2016_order"(user_id, billing_address_id, shipping_address_id, placement) 
-           values %s
-        """
-
         self.clear_test_data()
         book_ids_num = user_num * order_per_user
         print(f"\n ****** The first {book_ids_num} books were chosen ******\n")
         # create fake prices
         prices = [MiscMixin.money() for _ in range(book_ids_num)]
         for i in range(book_ids_num):
-            self._cursor.execute(book_sql, (prices[i], i + 1))
+            self._update_book_price(i + 1, prices[i])
+        rows = book_ids_num
         # create fake users
-        users = list(UserFactory.generate_users(user_num))
-        values = [[user.username, user.password, user.phone_number, user.email, user.real_name] for user in users]
-        execute_values(self._cursor, user_sql, values)
+        rows += self._insert_rows("user", User.COLUMNS, UserFactory.generate_user_rows(user_num))
         # create fake addresses
         address_nums = address_per_user * user_num
-        addresses = list(AddressFactory.generate_addresses(address_nums))
-        values = [[address.address_name, address.address_number, address.city, address.country, address.postal_code]
-                  for address in addresses]
-        execute_values(self._cursor, address_sql, values)
+        rows += self._insert_rows("address", Address.COLUMNS, AddressFactory.generate_address_rows(address_nums))
         # create fake user addresses
         user_address_mapper = {}
-        user_addresses = list(UserAddressFactory.generate_user_addresses(user_address_mapper,
-                                                                         user_num, address_per_user))
-        values = [[user_address.address, user_address.user, user_address.is_physical, user_address.is_shipping,
-                   user_address.is_billing, user_address.is_active] for user_address in user_addresses]
-        execute_values(self._cursor, user_address_sql, values)
+        rows += self._insert_rows("user_address", UserAddress.COLUMNS,
+                                  UserAddressFactory.generate_user_address_rows(user_address_mapper, user_num,
+                                                                                address_per_user))
         # create fake orders
-        orders = list(OrderFactory.generate_orders(user_address_mapper, user_num, order_per_user))
-        values = [[order.user, order.billing_address, order.shipping_address, order.placement] for order in orders]
-        execute_values(self._cursor, order_sql, values)
+        order_rows = OrderFactory.generate_order_rows(user_address_mapper, user_num, order_per_user)
+        rows += self._insert_rows("order", Order.COLUMNS, order_rows)
         # create fake book orders
-        book_orders = list(BookOrderFactory.generate_book_orders(book_ids_num, len(orders)))
-        values = [[book_order.book, book_order.order, book_order.quantity] for book_order in book_orders]
-        execute_values(self._cursor, book_order_sql, values)
-        self._conn.commit()
+        rows += self._insert_rows("book_order", BookOrder.COLUMNS,
+                                  BookOrderFactory.generate_book_order_rows(book_ids_num, len(order_rows)))
+        self.commit_policy.commit(self._conn, rows)
+
+    def _insert_rows(self, table, columns, rows):
+        """
+        Inserts the rows into the table with a multi row insert.
+        :param table: the table name, without the prefix
+        :param columns: the column names of the values in each row
+        :param rows: list of tuples
+        :returns: the number of inserted rows
+        """
+        sql = f"""insert into {self._table(table)}({", ".join(columns)}) values %s"""
+        execute_values(self._cursor, sql, rows)
+        return len(rows)
 
     def clear_test_data(self):
-        queries = ["""truncate "2016_user", "2016_order", "2016_book_order", "2016_user_address" restart identity""",
-                   """delete from "2016_address" """, """alter sequence "2016_address_address_id_seq" RESTART WITH 1"""]
+        queries = [f"""truncate {self._table("user")}, {self._table("order")}, {self._table("book_order")},
+                       {self._table("user_address")} restart identity""",
+                   f"""delete from {self._table("address")} """,
+                   f"""alter sequence {self._table("address_address_id_seq")} RESTART WITH 1"""]
         for query in queries:
             self._cursor.execute(query)
-        self._conn.commit()
+        self.commit_policy.commit_ddl(self._conn)
+
+    def _prepare(self, name, sql):
+        """
+        Prepares a statement on the server side, once per connection.
+        :param name: name of the prepared statement
+        :param sql: the statement, parameters are referenced as $1, $2 ...
+        """
+        if name not in self._prepared_statements:
+            self._cursor.execute(f"prepare {name} as {sql}")
+            self._prepared_statements.add(name)
+
+    def _book_id(self, book):
+        """
+        :param book: the database id of a book or its isbn
+        :returns: the database id of the book
+        :raises ValueError: if a book with the isbn does not exist
+        """
+        if not isinstance(book, str):
+            return book
+        found = self.get_book_by_isbn(book)
+        if found is None:
+            raise ValueError(f"There is no book with isbn {book}")
+        return found[0]
+
+    def replace_order(self, user_id, order_id, items):
+        """
+        Replaces an order of a user with a new one, that keeps the addresses of the old order and contains
+        the given items, in a single transaction. The order row is locked first, so concurrent replacements
+        of the same order are serialized and only the first one succeeds.
+        :param user_id: the id of the user
+        :param order_id: the id of the order that is replaced
+        :param items: iterable of (book, quantity), where book is the database id of the book or its isbn,
+        which is resolved with the cached isbn lookup, books must be unique
+        :returns: the id of the new order or None if the user does not have the order
+        :raises ValueError: if a book with the isbn does not exist
+        """
+        self._prepare("replace_order_lock", self._replace_order_lock_sql())
+        self._prepare("replace_order", self._replace_order_sql())
+        items = list(items)
+        book_ids = [self._book_id(book) for book, _ in items]
+        quantities = [quantity for _, quantity in items]
+        try:
+            self._cursor.execute("execute replace_order_lock(%s, %s)", (user_id, order_id))
+            if self._cursor.fetchone() is None:
+                self._conn.rollback()
+                return None
+            self._cursor.execute("execute replace_order(%s, %s, %s, %s)", (user_id, order_id, book_ids, quantities))
+            new_order_id = self._cursor.fetchone()[0]
+            self.commit_policy.commit(self._conn)
+            return new_order_id
+        except psycopg2.Error:
+            self._conn.rollback()
+            raise
 
     def assign_prices_to_books(self):
-        book_sql = """update "2016_book" set current_price=%s where book_id=%s"""
-        book_sql_id = """select book_id from "2016_book" order by book_id desc limit 1"""
+        book_sql_id = f"""select book_id from {self._table("book")} order by book_id desc limit 1"""
         self._cursor.execute(book_sql_id)
         max_id = self._cursor.fetchone()[0]
         prices = [MiscMixin.money() for _ in range(max_id)]
-        for i in range(max_id):
-            self._cursor.execute(book_sql, (prices[i], i + 1))
-        self._conn.commit()
+        try:
+            for i in range(max_id):
+                self._update_book_price(i + 1, prices[i])
+                self.commit_policy.rows_written(self._conn)
+            self.commit_policy.commit(self._conn)
+        except psycopg2.Error:
+            # the cached prices may have been updated by a transaction that did not commit
+            self.invalidate_lookup_caches(authors=False)
+            raise
 
     def assign_addresses_to_publishers(self):
-        publisher_sql = """update "2016_publisher" set address_id=%s where publisher_id=%s"""
-        publisher_sql_id = """select publisher_id from "2016_publisher" order by publisher_id desc limit 1"""
-        address_sql_id = """select address_id from "2016_address" order by address_id desc limit 1"""
+        publisher_sql = f"""update {self._table("publisher")} set address_id=%s where publisher_id=%s"""
+        publisher_sql_id = f"""
+            select publisher_id from {self._table("publisher")} order by publisher_id desc limit 1
+        """
+        address_sql_id = f"""select address_id from {self._table("address")} order by address_id desc limit 1"""
         self._cursor.execute(publisher_sql_id)
         max_pub_id = self._cursor.fetchone()[0]
         self._cursor.execute(address_sql_id)
@@ -245,11 +1005,12 @@ class ComicBooksDBManager(object):
         for i in range(max_pub_id):
             random_id = random.randint(1, max_address_id)
             self._cursor.execute(publisher_sql, (random_id, i + 1))
-        self._conn.commit()
+            self.commit_policy.rows_written(self._conn)
+        self.commit_policy.commit(self._conn)
 
     def assign_gender_nationality_to_authors(self):
-        author_sql = """update "2016_author" set gender=%s, nationality=%s where author_id=%s"""
-        author_sql_id = """select author_id from "2016_author" order by author_id desc limit 1"""
+        author_sql = f"""update {self._table("author")} set gender=%s, nationality=%s where author_id=%s"""
+        author_sql_id = f"""select author_id from {self._table("author")} order by author_id desc limit 1"""
         self._cursor.execute(author_sql_id)
         max_author_id = self._cursor.fetchone()[0]
         gen = FakeGenerator()
@@ -257,21 +1018,32 @@ class ComicBooksDBManager(object):
             random_gender = gen.gender()
             random_nationality = gen.nationality()
             self._cursor.execute(author_sql, (random_gender, random_nationality, i + 1))
-        self._conn.commit()
+            self.commit_policy.rows_written(self._conn)
+        self.commit_policy.commit(self._conn)
 
     @classmethod
-    def create(cls, database, password, user="postgres", host="localhost", port="5432"):
+    def create(cls, database, password, user="postgres", host="localhost", port="5432", review_partition_size=None,
+               schema=None, table_prefix=None, lookup_cache_size=None, commit_policy=None):
         """
         :param database: database name
         :param password: password for the specified database user
         :param user: database user - defaults to postgres
         :param host: host ip - defaults to localhost
         :param port: connection port - defaults to 5432
+        :param review_partition_size: book ids per review partition, if the review tables are partitioned,
+        defaults to the layout of the existing review table
+        :param schema: the schema of the tables, defaults to DEFAULT_SCHEMA
+        :param table_prefix: the prefix of the table names, defaults to DEFAULT_TABLE_PREFIX
+        :param lookup_cache_size: maximum entries of each lookup cache, defaults to LOOKUP_CACHE_SIZE
+        :param commit_policy: CommitPolicy of the write paths, defaults to one commit per write path
         :rtype: ComicBooksDBManager
         """
-        db_manager = cls()
+        db_manager = cls(schema=schema, table_prefix=table_prefix, lookup_cache_size=lookup_cache_size,
+                         commit_policy=commit_policy)
+        db_manager._conn_params = dict(database=database, password=password, user=user, host=host, port=port)
+        db_manager._review_partition_size = review_partition_size
         try:
-            conn = psycopg2.connect(database=database, password=password, user=user, host=host, port=port)
+            conn = db_manager._connect()
             cursor = conn.cursor()
             db_manager._conn = conn
             db_manager._cursor = cursor
@@ -279,6 +1051,8 @@ class ComicBooksDBManager(object):
             record = cursor.fetchone()
             print(f"You are connected into the - {record}\n")
             print(f"DSN details: {conn.get_dsn_parameters()}\n")
+            if review_partition_size is None:
+                db_manager._review_partition_size = db_manager._detect_review_partition_size()
             return db_manager
         except(Exception, psycopg2.Error) as error:
             print("Error connecting to PostgreSQL database", error)
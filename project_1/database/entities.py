@@ -3,6 +3,24 @@
 
 class BaseEntity(object):
     """BaseEntity Object"""
+    # the columns of the entity table that are not generated by the database, in the order of the table
+    COLUMNS = ()
+    # the attributes holding the values of COLUMNS, only declared when they differ from the column names
+    FIELDS = ()
+
+    @classmethod
+    def fields(cls):
+        """
+        :returns: the attribute names in the order of COLUMNS
+        """
+        return cls.FIELDS or cls.COLUMNS
+
+    def to_row(self):
+        """
+        :returns: tuple of the attribute values in the order of COLUMNS
+        """
+        return tuple(getattr(self, field) for field in self.fields())
+
     @classmethod
     def build_from_data(cls, data: dict):
         """Builds the object from the given data"""
@@ -18,6 +36,8 @@ class BaseEntity(object):
 
 class Author(BaseEntity):
     """Represents an Author entity"""
+    COLUMNS = ("gender", "name", "nationality")
+
     def __init__(self):
         self.name = None
         self.nationality = None
@@ -26,12 +46,11 @@ class Author(BaseEntity):
     def __str__(self):
         return f"Author(author_id={self.name + self.nationality})"
 
-    def to_list(self):
-        return [self.gender, self.name, self.nationality]
-
 
 class Address(BaseEntity):
     """Represents an Address entity"""
+    COLUMNS = ("address_name", "address_number", "city", "country", "postal_code")
+
     def __init__(self):
         self.address_name = None
         self.address_number = None
@@ -49,6 +68,8 @@ class Address(BaseEntity):
 
 class Book(BaseEntity):
     """Represents a Book entity"""
+    COLUMNS = ("isbn", "current_price", "description", "publication_year", "title", "publisher_id")
+    FIELDS = ("isbn", "current_price", "description", "publication_year", "title", "publisher")
 
     def __init__(self):
         self.isbn = None
@@ -68,6 +89,8 @@ class Book(BaseEntity):
 
 class Publisher(BaseEntity):
     """Represents a Publisher entity"""
+    COLUMNS = ("name", "phone_number", "address_id")
+    FIELDS = ("name", "phone_number", "address")
 
     def __init__(self):
         self.address = None
@@ -83,6 +106,8 @@ class Publisher(BaseEntity):
 
 class Order(BaseEntity):
     """Represents a Order entity"""
+    COLUMNS = ("user_id", "billing_address_id", "shipping_address_id", "placement", "completed")
+    FIELDS = ("user", "billing_address", "shipping_address", "placement", "completed")
 
     def __init__(self):
         self.user = None
@@ -97,6 +122,7 @@ class Order(BaseEntity):
 
 class User(BaseEntity):
     """Represents a User entity"""
+    COLUMNS = ("username", "email", "password", "phone_number", "real_name")
 
     def __init__(self):
         self.username = None
@@ -115,6 +141,7 @@ class User(BaseEntity):
 
 class Review(BaseEntity):
     """Represents a Review entity"""
+    COLUMNS = ("created", "nickname", "score", "text")
 
     def __init__(self):
         self.nickname = None
@@ -132,6 +159,8 @@ class Review(BaseEntity):
 
 class BookReview(BaseEntity):
     """Represents a BookReview entity"""
+    COLUMNS = ("book_id", "review_id")
+    FIELDS = ("book", "review")
 
     def __init__(self):
         self.book = None
@@ -143,6 +172,8 @@ class BookReview(BaseEntity):
 
 class BookAuthor(BaseEntity):
     """Represents a BookAuthor entity"""
+    COLUMNS = ("author_id", "book_id", "author_ordinal", "role")
+    FIELDS = ("author", "book", "ordinal", "role")
 
     def __init__(self):
         self.author = None
@@ -156,6 +187,8 @@ class BookAuthor(BaseEntity):
 
 class BookOrder(BaseEntity):
     """Represents a BookOrder entity"""
+    COLUMNS = ("book_id", "order_id", "quantity")
+    FIELDS = ("book", "order", "quantity")
 
     def __init__(self):
         self.book = None
@@ -168,6 +201,8 @@ class BookOrder(BaseEntity):
 
 class UserAddress(BaseEntity):
     """Represents a UserAddress entity"""
+    COLUMNS = ("address_id", "user_id", "is_physical", "is_shipping", "is_billing", "is_active")
+    FIELDS = ("address", "user", "is_physical", "is_shipping", "is_billing", "is_active")
 
     def __init__(self):
         self.address = None
@@ -193,6 +193,16 @@ class AddressFactory(object):
                     "city": _fg.city(), "country": _fg.country(), "postal_code": _fg.postal_code()}
             yield Address.build_from_data(data)
 
+    @staticmethod
+    def generate_address_rows(n=1):
+        """
+        Generates rows of fake addresses without building Address objects
+        :param n: number of rows to be generated
+        :returns: list of tuples in the order of Address.COLUMNS
+        """
+        return [(_fg.address_name(), _fg.address_number(), _fg.city(), _fg.country(), _fg.postal_code())
+                for _ in range(n)]
+
     def __str__(self):
         return "AddressFactory"
 
@@ -283,6 +293,28 @@ class UserFactory(object):
             yield User.build_from_data(data)
         _fg.clear_unique()
 
+    @staticmethod
+    def generate_user():
+        """
+        Generates a single User. Unlike next(generate_users()) the generator runs to completion, so the
+        unique data are cleared.
+        :returns: User
+        """
+        user, = UserFactory.generate_users()
+        return user
+
+    @staticmethod
+    def generate_user_rows(n=1):
+        """
+        Generates rows of fake users without building User objects
+        :param n: number of rows to be generated
+        :returns: list of tuples in the order of User.COLUMNS
+        """
+        rows = [(username, email, _fg.password(), _fg.phone_number(), _fg.name())
+                for username, email in zip(_fg.usernames(n=n), _fg.emails(n=n))]
+        _fg.clear_unique()
+        return rows
+
     def __str__(self):
         return "UserFactory"
 
@@ -324,6 +356,21 @@ class UserAddressFactory(object):
                 user_address_mapper[i].append(j)
                 yield UserAddress.build_from_data(data)
 
+    @staticmethod
+    def generate_user_address_rows(user_address_mapper, user_num=1, addresses_per_user=1):
+        """
+        Generates the same data as generate_user_addresses without building UserAddress objects
+        :param user_address_mapper: dict that holds the mapping of user_id -> address_id
+        :param user_num: number of users
+        :param addresses_per_user: number of addresses per user
+        :returns: list of tuples in the order of UserAddress.COLUMNS
+        """
+        rows = []
+        for i in range(1, user_num + 1):
+            user_address_mapper[i] = list(range(i, i + addresses_per_user))
+            rows.extend((j, i, True, True, True, True) for j in user_address_mapper[i])
+        return rows
+
     def __str__(self):
         return "UserAddressFactory"
 
@@ -345,6 +392,18 @@ class OrderFactory(object):
                         "shipping_address": user_address_mapper[i][0], "placement": _fg.timestamp()}
                 yield Order.build_from_data(data)
 
+    @staticmethod
+    def generate_order_rows(user_address_mapper, user_num=1, order_per_user=1):
+        """
+        Generates the same data as generate_orders without building Order objects
+        :param user_address_mapper: dict that holds the mapping of user_id -> address_id
+        :param user_num: number of users
+        :param order_per_user: number of orders per user
+        :returns: list of tuples in the order of Order.COLUMNS
+        """
+        return [(i, user_address_mapper[i][0], user_address_mapper[i][0], _fg.timestamp(), None)
+                for i in range(1, user_num + 1) for _ in range(order_per_user)]
+
     def __str__(self):
         return "OrderFactory"
 
@@ -363,5 +422,15 @@ class BookOrderFactory(object):
             data = {"book": random.randint(1, book_num), "order": i, "quantity": random.randint(1, 4)}
             yield BookOrder.build_from_data(data)
 
+    @staticmethod
+    def generate_book_order_rows(book_num=10, order_num=10):
+        """
+        Generates the same data as generate_book_orders without building BookOrder objects
+        :param book_num: number of books available
+        :param order_num: number of total orders
+        :returns: list of tuples in the order of BookOrder.COLUMNS
+        """
+        return [(random.randint(1, book_num), i, random.randint(1, 4)) for i in range(1, order_num + 1)]
+
     def __str__(self):
         return "BookOrderFactory"
@@ -0,0 +1,118 @@
+"""Dependency aware scheduling of table loads, independent tables are loaded concurrently"""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def catalog_dependencies(cursor, schema, tables):
+    """
+    Reads the foreign key dependencies between the given tables from pg_constraint.
+    :param cursor: cursor of an open connection
+    :param schema: the schema of the tables
+    :param tables: iterable of table names
+    :returns: {table: set of the tables it references}, references to other tables and self references are
+    left out
+    """
+    tables = list(tables)
+    cursor.execute("""
+        select c.relname, p.relname
+        from pg_constraint as k
+            join pg_class as c on c.oid = k.conrelid
+            join pg_class as p on p.oid = k.confrelid
+            join pg_namespace as n on n.oid = c.relnamespace
+        where k.contype = 'f' and n.nspname = %s and c.relname = any(%s) and p.relname = any(%s)
+    """, (schema, tables, tables))
+    dependencies = {table: set() for table in tables}
+    for table, referenced in cursor.fetchall():
+        if table != referenced:
+            dependencies[table].add(referenced)
+    return dependencies
+
+
+class LoadScheduler(object):
+    """
+    Runs the loads of a set of tables on a pool of threads, each load on its own connection and in its own
+    transaction. A load starts as soon as the loads of all the tables it depends on have been committed, so
+    tables that do not depend on each other are loaded at the same time.
+    """
+
+    def __init__(self, connect, dependencies, workers=4, commit_policy=None):
+        """
+        :param connect: function that opens a new psycopg2 connection
+        :param dependencies: {table: iterable of the tables it depends on}
+        :param workers: maximum number of concurrent loads
+        :param commit_policy: database.commit_policy.CommitPolicy that commits and measures the loads
+        """
+        self._connect = connect
+        self.commit_policy = commit_policy
+        self.dependencies = {table: set(depends_on) for table, depends_on in dependencies.items()}
+        self.workers = workers
+
+    def __str__(self):
+        return f"LoadScheduler(tables={len(self.dependencies)}, workers={self.workers})"
+
+    def _pending(self, tasks):
+        """
+        :returns: {table: set of the tasks it waits for}
+        :raises ValueError: if the dependencies of the tasks are cyclic
+        """
+        pending = {table: (self.dependencies.get(table, set()) & set(tasks)) - {table} for table in tasks}
+        remaining = {table: set(depends_on) for table, depends_on in pending.items()}
+        while remaining:
+            ready = [table for table, depends_on in remaining.items() if not depends_on]
+            if not ready:
+                raise ValueError(f"Cyclic dependencies between the tables {sorted(remaining)}")
+            for table in ready:
+                del remaining[table]
+            for depends_on in remaining.values():
+                depends_on.difference_update(ready)
+        return pending
+
+    def _load(self, task, start):
+        """
+        Runs a task on a new connection and commits it.
+        :returns: {"start_s": float, "seconds": float}, relative to the start of the run
+        """
+        conn = self._connect()
+        task_start = time.perf_counter()
+        try:
+            with conn.cursor() as cursor:
+                task(cursor)
+            if self.commit_policy:
+                self.commit_policy.commit(conn)
+            else:
+                conn.commit()
+        finally:
+            conn.close()
+            if self.commit_policy:
+                self.commit_policy.forget(conn)
+        return {"start_s": task_start - start, "seconds": time.perf_counter() - task_start}
+
+    def run(self, tasks):
+        """
+        Runs the loads. If a load fails, the loads already running are completed, the rest are not started
+        and the error is raised. The loads that have been committed are not rolled back.
+        :param tasks: {table: function that takes a cursor and loads the table}, the tables that are not
+        in the tasks are considered loaded
+        :returns: {table: {"start_s": float, "seconds": float}} in the order the loads completed
+        """
+        pending = self._pending(tasks)
+        timings = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+
+            def submit_ready():
+                for table in [table for table, depends_on in pending.items() if not depends_on]:
+                    del pending[table]
+                    running[executor.submit(self._load, tasks[table], start)] = table
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table = running.pop(future)
+                    timings[table] = future.result()
+                    for depends_on in pending.values():
+                        depends_on.discard(table)
+                submit_ready()
+        return timings
@@ -0,0 +1,81 @@
+"""Bounded least recently used cache of the lookups of ComicBooksDBManager"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Mapping with a maximum size, that evicts the least recently used entry when it is full and counts the
+    hits and misses of its lookups. It is thread safe, so the lookups of a manager can be shared by threads
+    that use their own connections, e.g. the clients of the workload generator.
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        :param max_size: maximum number of entries
+        """
+        if max_size < 1:
+            raise ValueError("The size of the cache must be positive")
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return f"LRUCache(size={len(self)}, max_size={self.max_size})"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        :returns: the value of the key, which becomes the most recently used, or the default on a miss
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """
+        :returns: the value of the key or the default, without counting the lookup or changing the order
+        """
+        with self._lock:
+            return self._entries.get(key, default)
+
+    def put(self, key, value):
+        """Adds or replaces the entry of the key, evicting the least recently used entry if the cache is full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Removes the entry of the key, if it is cached"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes all the entries, the counters are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    def statistics(self):
+        """
+        :returns: {"size": int, "max_size": int, "hits": int, "misses": int, "evictions": int, "hit_ratio": float}
+        """
+        lookups = self.hits + self.misses
+        return {"size": len(self), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_ratio": self.hits / lookups if lookups else None}
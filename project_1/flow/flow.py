@@ -1,15 +1,43 @@
 import argparse
+import json
 
+from project_1.benchmark.async_reads import run_async_read_benchmark
+from project_1.benchmark.book_index import run_parser_book_index_benchmark
+from project_1.benchmark.order_replacement import run_order_replacement_benchmark
+from project_1.benchmark.search import run_search_benchmark
+from project_1.benchmark.validation import run_validation_benchmark
+from project_1.benchmark.workload import WorkloadGenerator, parse_mix
+from project_1.database.commit_policy import CommitPolicy
 from project_1.database.database_manager import ComicBooksDBManager
+from project_1.flow.multi_dataset import load_datasets
+from project_1.flow.profiling import FlowProfiler, stage
+from project_1.parser.book_index import BOOK_INDEX_KINDS
 from project_1.parser.parser import UCSDJsonDataParser
 
 FLOW_HELP_TEXT = """
-flow of the program, defaults to main. It has 3 options:
+flow of the program, defaults to main. It has the following options:
     main: parses the dataset and inserts the actual data into the db,
     test: provided that the main flow has been executed at least once or the database contains data 
     creates some users, orders and addresses for testing,
     test_rb: clears the tables that were used by the test flow in order for the database to contain clean data, 
-    however book price updates have to be cleaned manually.
+    however book price updates have to be cleaned manually,
+    bench_orders: provided that the test flow has been executed, replaces orders concurrently and reports
+    the throughput, latencies and lock statistics of the order replacement transaction,
+    workload: provided that the test flow has been executed, runs a mix of sign ups, order placements, book reads
+    and review posts from several threads and reports the throughput and latencies of each operation,
+    multi: parses and loads the genre datasets given by --genres in parallel, each one into the schema named
+    after the genre,
+    bench_search: provided that the main flow has been executed, creates the full text search indexes and
+    reports the latencies of the review and book searches with and without them,
+    bench_book_index: compares the build time, the memory and the lookup time of the book indexes of the
+    reviews pass of the parser, using the book ids of the dataset of --genre, and the peak memory of the
+    reviews pass when the dataset is parsed with each index,
+    bench_async: provided that the main flow has been executed, reads books along with their authors and
+    reviews from --threads concurrent clients, first threads with synchronous managers and then asyncio tasks
+    sharing the connection pool of the async manager, and reports the connections, throughput and latencies of
+    both,
+    bench_validation: compares the batch application of the book validation rules against a per record
+    evaluation of the same rules, using the book data of --genre.
     """
 
 
@@ -24,26 +52,126 @@ def _parse_user_args():
     arg_parser.add_argument('-u', '--user', nargs='?', default="postgres", help="database user, defaults to postgres")
     arg_parser.add_argument('-i', '--ip', nargs='?', default="localhost", help="connection ip, defaults to localhost")
     arg_parser.add_argument('-p', '--port', nargs='?', default="5432", help="connection port, defaults to 5432")
-    arg_parser.add_argument('-f', '--flow', help=FLOW_HELP_TEXT, default="main", choices=["main", "test", "test_rb"])
+    arg_parser.add_argument('-f', '--flow', help=FLOW_HELP_TEXT, default="main",
+                            choices=["main", "test", "test_rb", "bench_orders", "workload", "multi", "bench_search",
+                                     "bench_book_index", "bench_async",
+                                     "bench_validation"])
+    arg_parser.add_argument('-s', '--schema', default=None, help="schema of the tables, defaults to public")
+    arg_parser.add_argument('--table-prefix', default=None, help="prefix of the table names, defaults to 2016_")
+    arg_parser.add_argument('--genre', default=None,
+                            help="main flow only: the goodreads genre dataset, defaults to comics_graphic")
+    arg_parser.add_argument('--genres', default=None,
+                            help="multi flow only: comma separated goodreads genres, e.g. "
+                                 "fantasy_paranormal,mystery_thriller_crime")
+    arg_parser.add_argument('--referenced-authors-only', action='store_true',
+                            help="main flow only: skip the authors that are not referenced by any comic book")
+    arg_parser.add_argument('--dead-letter', default=None,
+                            help="main flow only: json lines file where the rejected records are written")
+    arg_parser.add_argument('--review-partition-size', type=int, default=None,
+                            help="main flow only: partition the review tables by book id, using the given "
+                                 "number of book ids per partition")
+    arg_parser.add_argument('--book-limit', type=int, default=None,
+                            help="main flow only: load only the first n books, along with their authors and reviews")
+    arg_parser.add_argument('--sample-fraction', type=float, default=None,
+                            help="main flow only: load only this fraction (0 - 1) of the books, along with their "
+                                 "authors and reviews")
+    arg_parser.add_argument('--parallel-load', action='store_true',
+                            help="main flow only: insert the tables that do not depend on each other concurrently, "
+                                 "each one in its own transaction, and report the time of each table")
+    arg_parser.add_argument('--search-indexes', action='store_true',
+                            help="main flow only: add the full text search columns and indexes after the load")
+    arg_parser.add_argument('--book-index', default="dict", choices=BOOK_INDEX_KINDS,
+                            help="main flow only: index of the book ids looked up while parsing the reviews, with "
+                                 "sorted and sqlite the book dict is spilled to disk during the reviews pass, see "
+                                 "bench_book_index")
+    arg_parser.add_argument('--bloom-error-rate', type=float, default=None,
+                            help="main flow only: front the book index with a Bloom filter with this false positive "
+                                 "rate, e.g. 0.01")
+    arg_parser.add_argument('--stats', default=None,
+                            help="main flow only: collect the dataset statistics while parsing and save them in the "
+                                 "given file, as numpy arrays if it ends with .npz and as json otherwise")
+    arg_parser.add_argument('--seed', type=int, default=0, help="main flow only: seed of the book sampling")
+    arg_parser.add_argument('--commit-rows', type=int, default=None,
+                            help="main, test and additional data flows: commit every n written rows, by default each "
+                                 "write path commits once")
+    arg_parser.add_argument('--commit-seconds', type=float, default=None,
+                            help="main, test and additional data flows: commit every n seconds")
+    arg_parser.add_argument('--async-commit', action='store_true',
+                            help="main, test and additional data flows: turn synchronous_commit off, commits do not "
+                                 "wait for the WAL flush")
+    arg_parser.add_argument('--threads', type=int, default=8, help="benchmark flows only: concurrent clients")
+    arg_parser.add_argument('--transactions', type=int, default=200,
+                            help="benchmark flows only: transactions executed by each client")
+    arg_parser.add_argument('--mix', default=None,
+                            help="workload flow only: operation weights, e.g. read_book=6,place_order=2,"
+                                 "sign_up=1,post_review=1")
+    arg_parser.add_argument('--pool-size', type=int, default=None,
+                            help="bench_async flow only: connections of the async connection pool, defaults to "
+                                 "--threads, the connections of the threaded run")
+    arg_parser.add_argument('--output', default=None, help="benchmark flows only: json file for the results")
+    arg_parser.add_argument('--profile', nargs='?', const="flow.pstats", default=None,
+                            help="profile the flow with cProfile, prints the sorted function stats and saves them "
+                                 "in the given pstats file, defaults to flow.pstats")
+    arg_parser.add_argument('--trace-memory', action='store_true',
+                            help="trace the memory of the flow with tracemalloc and report the peak of each stage")
     return arg_parser.parse_args()
 
 
+def _conn_params(args):
+    """
+    :param args: user arguments
+    :returns: the connection parameters given by the user
+    """
+    return dict(database=args.database, password=args.password, user=args.user, host=args.ip, port=args.port)
+
+
+def _commit_policy(args):
+    """
+    :param args: user arguments
+    :returns: the commit policy given by the user
+    :rtype: CommitPolicy
+    """
+    return CommitPolicy(every_rows=args.commit_rows, every_seconds=args.commit_seconds,
+                        synchronous_commit=not args.async_commit)
+
+
 def _main_flow(args):
     """
     Described in FLOW_HELP_TEXT
     :param args: user arguments
     """
     # Parse data
-    json_parser = UCSDJsonDataParser()
-    json_parser.process_data()
+    json_parser = UCSDJsonDataParser(referenced_authors_only=args.referenced_authors_only,
+                                     dead_letter_path=args.dead_letter, book_limit=args.book_limit,
+                                     sample_fraction=args.sample_fraction, seed=args.seed, genre=args.genre,
+                                     book_index=args.book_index, bloom_error_rate=args.bloom_error_rate,
+                                     collect_statistics=args.stats is not None)
+    with stage("parse"):
+        json_parser.process_data()
+    for name, statistics in json_parser.get_rejection_statistics().items():
+        print(f"{name}: {statistics}")
+    if args.stats:
+        json_parser.save_dataset_statistics(args.stats)
     author_data = json_parser.get_parsed_author_data()
     book_data = json_parser.get_parsed_book_data()
+    review_data = json_parser.get_parsed_review_data()
 
     # Establish the db connection and create the data
     db_manager = ComicBooksDBManager.create(database=args.database, password=args.password, user=args.user,
-                                            host=args.ip, port=args.port)
-    db_manager.truncate_tables()
-    db_manager.insert_parsed_data(author_data, book_data)
+                                            host=args.ip, port=args.port, schema=args.schema,
+                                            table_prefix=args.table_prefix,
+                                            commit_policy=_commit_policy(args))
+    with stage("insert"):
+        db_manager.truncate_tables()
+        if args.review_partition_size:
+            db_manager.create_partitioned_review_tables(args.review_partition_size)
+        timings = db_manager.insert_parsed_data(author_data, book_data, review_data, parallel=args.parallel_load)
+    for table, timing in timings.items():
+        print(f"{table}: started at {timing['start_s']:.3f}s, took {timing['seconds']:.3f}s")
+    if args.search_indexes:
+        with stage("search indexes"):
+            db_manager.create_search_indexes()
+    print(f"commits: {db_manager.commit_policy.statistics()}")
     db_manager.close()
 
 
@@ -53,8 +181,12 @@ def _test_flow(args):
     :param args: user arguments
     """
     db_manager = ComicBooksDBManager.create(database=args.database, password=args.password, user=args.user,
-                                            host=args.ip, port=args.port)
-    db_manager.create_test_data()
+                                            host=args.ip, port=args.port, schema=args.schema,
+                                            table_prefix=args.table_prefix,
+                                            commit_policy=_commit_policy(args))
+    with stage("insert"):
+        db_manager.create_test_data()
+    print(f"commits: {db_manager.commit_policy.statistics()}")
     db_manager.close()
 
 
@@ -64,21 +196,148 @@ def _test_rb_flow(args):
     :param args: user arguments
     """
     db_manager = ComicBooksDBManager.create(database=args.database, password=args.password, user=args.user,
-                                            host=args.ip, port=args.port)
-    db_manager.clear_test_data()
+                                            host=args.ip, port=args.port, schema=args.schema,
+                                            table_prefix=args.table_prefix)
+    with stage("clear"):
+        db_manager.clear_test_data()
     db_manager.close()
 
 
+def _bench_orders_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    results = run_order_replacement_benchmark(_conn_params(args), threads=args.threads,
+                                              transactions_per_thread=args.transactions, schema=args.schema,
+                                              table_prefix=args.table_prefix)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+def _bench_search_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    results = run_search_benchmark(_conn_params(args), schema=args.schema, table_prefix=args.table_prefix)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+def _bench_book_index_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    results = run_parser_book_index_benchmark(genre=args.genre, bloom_error_rate=args.bloom_error_rate or 0.01)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+def _bench_async_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    results = run_async_read_benchmark(_conn_params(args), concurrency=args.threads,
+                                       requests=args.threads * args.transactions, pool_size=args.pool_size,
+                                       schema=args.schema, table_prefix=args.table_prefix)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+def _bench_validation_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    results = run_validation_benchmark(genre=args.genre)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+def _workload_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    mix = parse_mix(args.mix) if args.mix else None
+    generator = WorkloadGenerator(_conn_params(args), mix=mix, threads=args.threads, schema=args.schema,
+                                  table_prefix=args.table_prefix)
+    results = generator.run(operations_per_thread=args.transactions)
+    print(json.dumps(results, indent=2, default=str))
+    if args.output:
+        WorkloadGenerator.export(results, args.output)
+
+
+def _run_flow(name, flow, args):
+    """
+    Runs the flow, profiled when the user asked for it.
+    :param name: name of the flow
+    :param flow: function that takes the user arguments
+    :param args: user arguments
+    """
+    if not (args.profile or args.trace_memory):
+        flow(args)
+        return
+    with FlowProfiler(profile_path=args.profile, trace_memory=args.trace_memory).run(name):
+        flow(args)
+
+
+def _multi_flow(args):
+    """
+    Described in FLOW_HELP_TEXT
+    :param args: user arguments
+    """
+    genres = [genre.strip() for genre in args.genres.split(",")] if args.genres else []
+    if not genres:
+        raise ValueError("The multi flow requires at least one genre in --genres")
+    parser_options = {"referenced_authors_only": args.referenced_authors_only, "book_limit": args.book_limit,
+                      "sample_fraction": args.sample_fraction, "seed": args.seed, "book_index": args.book_index,
+                      "bloom_error_rate": args.bloom_error_rate}
+    for result in load_datasets(_conn_params(args), genres, table_prefix=args.table_prefix,
+                                parser_options=parser_options):
+        print(result)
+
+
 def run_exercise():
     args = _parse_user_args()
-    flows = {"main": _main_flow, "test": _test_flow, "test_rb": _test_rb_flow}
-    flows[args.flow](args)
+    flows = {"main": _main_flow, "test": _test_flow, "test_rb": _test_rb_flow, "bench_orders": _bench_orders_flow,
+             "workload": _workload_flow, "multi": _multi_flow, "bench_search": _bench_search_flow,
+             "bench_book_index": _bench_book_index_flow, "bench_async": _bench_async_flow,
+             "bench_validation": _bench_validation_flow}
+    _run_flow(args.flow, flows[args.flow], args)
+
+
+def _additional_data_flow(args):
+    """
+    Assigns prices to the books, addresses to the publishers and gender and nationality to the authors.
+    :param args: user arguments
+    """
+    db_manager = ComicBooksDBManager.create(database=args.database, password=args.password, user=args.user,
+                                            host=args.ip, port=args.port, schema=args.schema,
+                                            table_prefix=args.table_prefix,
+                                            commit_policy=_commit_policy(args))
+    with stage("prices"):
+        db_manager.assign_prices_to_books()
+    with stage("publisher addresses"):
+        db_manager.assign_addresses_to_publishers()
+    with stage("author gender and nationality"):
+        db_manager.assign_gender_nationality_to_authors()
+    print(f"commits: {db_manager.commit_policy.statistics()}")
 
 
 def additional_data():
     args = _parse_user_args()
-    db_manager = ComicBooksDBManager.create(database=args.database, password=args.password, user=args.user,
-                                            host=args.ip, port=args.port)
-    db_manager.assign_prices_to_books()
-    db_manager.assign_addresses_to_publishers()
-    db_manager.assign_gender_nationality_to_authors()
+    _run_flow("additional_data", _additional_data_flow, args)
@@ -0,0 +1,53 @@
+"""Loading of several goodreads genre datasets side by side, each one in its own schema"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from project_1.database.database_manager import ComicBooksDBManager
+from project_1.parser.parser import UCSDJsonDataParser
+
+
+def load_dataset(conn_params, genre, schema=None, table_prefix=None, parser_options=None):
+    """
+    Parses a genre dataset and loads it into its own schema, using its own connection.
+    :param conn_params: dict with the database, password, user, host and port of the database
+    :param genre: the goodreads genre, e.g. fantasy_paranormal
+    :param schema: the schema of the dataset, defaults to the genre
+    :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+    :param parser_options: extra keyword arguments of UCSDJsonDataParser
+    :returns: {"genre": str, "schema": str, "books": int, "parse_s": float, "insert_s": float}
+    """
+    schema = schema if schema else genre
+    start = time.perf_counter()
+    json_parser = UCSDJsonDataParser(genre=genre, **(parser_options or {}))
+    json_parser.process_data()
+    parsed = time.perf_counter()
+
+    db_manager = ComicBooksDBManager.create(**conn_params, schema=schema, table_prefix=table_prefix)
+    if db_manager is None:
+        raise ConnectionError(f"Could not connect to the database for the {genre} dataset")
+    try:
+        db_manager.create_schema()
+        db_manager.insert_parsed_data(json_parser.get_parsed_author_data(), json_parser.get_parsed_book_data(),
+                                      json_parser.get_parsed_review_data())
+    finally:
+        db_manager.close()
+    return {"genre": genre, "schema": schema, "books": len(json_parser.get_parsed_book_data()),
+            "parse_s": parsed - start, "insert_s": time.perf_counter() - parsed}
+
+
+def load_datasets(conn_params, genres, table_prefix=None, parser_options=None, workers=None):
+    """
+    Loads the genre datasets in parallel, in separate processes, each dataset into the schema named after
+    its genre.
+    :param conn_params: dict with the database, password, user, host and port of the database
+    :param genres: iterable of goodreads genres
+    :param table_prefix: the prefix of the table names, defaults to ComicBooksDBManager.DEFAULT_TABLE_PREFIX
+    :param parser_options: extra keyword arguments of UCSDJsonDataParser
+    :param workers: number of processes, defaults to one per genre
+    :returns: list of the results of load_dataset, in the order of the genres
+    """
+    genres = list(genres)
+    with ProcessPoolExecutor(max_workers=workers if workers else len(genres)) as executor:
+        futures = [executor.submit(load_dataset, conn_params, genre, table_prefix=table_prefix,
+                                   parser_options=parser_options) for genre in genres]
+        return [future.result() for future in futures]
@@ -0,0 +1,105 @@
+"""Optional cProfile and tracemalloc instrumentation of the program flows"""
+import contextlib
+import cProfile
+import pstats
+import time
+import tracemalloc
+
+_active_profiler = None
+
+
+class FlowProfiler(object):
+    """
+    Profiles a flow with cProfile and/or traces its memory with tracemalloc. The flows mark their stages
+    (e.g. parse, insert) with the module level stage function, so the duration and the peak memory of each
+    stage are reported separately.
+    """
+
+    def __init__(self, profile_path=None, trace_memory=False, sort_by="cumulative", limit=30):
+        """
+        :param profile_path: if given the flow is profiled and the stats are dumped in this pstats file
+        :param trace_memory: if True the memory allocations of the flow are traced
+        :param sort_by: pstats sort key of the printed stats
+        :param limit: number of functions printed
+        """
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.sort_by = sort_by
+        self.limit = limit
+        self._profile = None
+        self._stages = []
+
+    def __str__(self):
+        return f"FlowProfiler(profile_path={self.profile_path}, trace_memory={self.trace_memory})"
+
+    @contextlib.contextmanager
+    def run(self, name):
+        """
+        Profiles the flow executed in the context and prints the report when it exits.
+        :param name: name of the flow
+        """
+        global _active_profiler
+        _active_profiler = self
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        try:
+            with self.stage(name):
+                yield self
+        finally:
+            if self._profile:
+                self._profile.disable()
+            _active_profiler = None
+            self.report()
+            if self.trace_memory:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measures the duration and the peak memory of the stage executed in the context. Nested stages are
+        measured as well, but the peak of the enclosing stage only accounts for the memory allocated after
+        the last nested stage started.
+        :param name: name of the stage
+        """
+        if self.trace_memory:
+            start_memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            measurement = {"stage": name, "seconds": time.perf_counter() - start}
+            if self.trace_memory:
+                end_memory, peak_memory = tracemalloc.get_traced_memory()
+                measurement["peak_mb"] = (peak_memory - start_memory) / 2 ** 20
+                measurement["retained_mb"] = (end_memory - start_memory) / 2 ** 20
+            self._stages.append(measurement)
+
+    def report(self):
+        """Prints the stage measurements and the sorted function stats and dumps the pstats file"""
+        print("\n ****** Stages ******\n")
+        for measurement in self._stages:
+            line = f"{measurement['stage']}: {measurement['seconds']:.3f}s"
+            if self.trace_memory:
+                line += f", peak {measurement['peak_mb']:.1f}MB, retained {measurement['retained_mb']:.1f}MB"
+            print(line)
+        if self._profile:
+            self._profile.dump_stats(self.profile_path)
+            print(f"\n ****** Profile (stats saved in {self.profile_path}) ******\n")
+            pstats.Stats(self._profile).sort_stats(self.sort_by).print_stats(self.limit)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Marks a stage of a flow, measured only when a FlowProfiler is running.
+    :param name: name of the stage
+    """
+    if _active_profiler is None:
+        yield
+    else:
+        with _active_profiler.stage(name):
+            yield
@@ -0,0 +1,209 @@
+"""Indexes of the valid book ids, used for the book id lookups of the reviews pass"""
+import array
+import bisect
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+
+class SortedBookIndex(object):
+    """
+    The book ids in a sorted array of 64 bit integers, searched with binary search. The ids are compared as
+    strings, like they are for the book dictionary, so only the ids that are the canonical decimal form of
+    an integer are stored in the array, e.g. "123" but not "0123", and the rest are kept in a set.
+    """
+
+    def __init__(self, book_ids):
+        """
+        :param book_ids: iterable of book ids
+        """
+        ids = array.array("q")
+        self._other_ids = set()
+        for book_id in book_ids:
+            key = self._key(book_id)
+            if key is None:
+                self._other_ids.add(book_id)
+            else:
+                ids.append(key)
+        self._ids = array.array("q", np.unique(np.frombuffer(ids, dtype=np.int64)).tobytes())
+
+    def __str__(self):
+        return f"SortedBookIndex(size={len(self)})"
+
+    def __len__(self):
+        return len(self._ids) + len(self._other_ids)
+
+    @staticmethod
+    def _key(book_id):
+        """
+        :param book_id: a book id
+        :returns: the integer of the id if the id is its canonical decimal form and fits in 64 bits, else None
+        """
+        try:
+            key = int(book_id)
+        except (TypeError, ValueError):
+            return None
+        return key if str(key) == book_id and -2 ** 63 <= key < 2 ** 63 else None
+
+    def __contains__(self, book_id):
+        if not isinstance(book_id, str):
+            return False
+        key = self._key(book_id)
+        if key is None:
+            return book_id in self._other_ids
+        index = bisect.bisect_left(self._ids, key)
+        return index < len(self._ids) and self._ids[index] == key
+
+    def close(self):
+        pass
+
+
+class SqliteBookIndex(object):
+    """The book ids in a temporary SQLite database on disk, only its page cache is kept in memory"""
+    CACHE_KB = 2048
+
+    def __init__(self, book_ids, directory=None):
+        """
+        :param book_ids: iterable of book ids
+        :param directory: directory of the temporary database file, defaults to the system temporary directory
+        """
+        descriptor, self.path = tempfile.mkstemp(prefix="book_index_", suffix=".sqlite", dir=directory)
+        os.close(descriptor)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(f"pragma cache_size = -{self.CACHE_KB}")
+        self._conn.execute("pragma journal_mode = off")
+        self._conn.execute("pragma synchronous = off")
+        self._conn.execute("create table book_ids (book_id text primary key) without rowid")
+        self._conn.executemany("insert or ignore into book_ids values (?)", ((book_id,) for book_id in book_ids))
+        self._conn.commit()
+
+    def __str__(self):
+        return f"SqliteBookIndex(path={self.path})"
+
+    def __len__(self):
+        return self._conn.execute("select count(*) from book_ids").fetchone()[0]
+
+    def __contains__(self, book_id):
+        if not isinstance(book_id, str):
+            return False
+        return self._conn.execute("select 1 from book_ids where book_id = ?", (book_id,)).fetchone() is not None
+
+    def close(self):
+        """Closes and deletes the database file"""
+        self._conn.close()
+        os.remove(self.path)
+
+
+class BloomFilter(object):
+    """
+    Bloom filter of strings. Membership tests have no false negatives and false positives with about the
+    given error rate, as long as at most capacity items are added.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: the expected number of items
+        :param error_rate: the target false positive rate (0 - 1)
+        """
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def __str__(self):
+        return f"BloomFilter(size={self.size}, hash_count={self.hash_count})"
+
+    def _hashes(self, item):
+        # double hashing, the positions are derived from the two halves of a single digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, item):
+        first, second = self._hashes(item)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        if not isinstance(item, str):
+            return False
+        first, second = self._hashes(item)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class BloomFrontedIndex(object):
+    """An index fronted by a Bloom filter, so most of the ids that are not indexed never reach the index"""
+
+    def __init__(self, index, book_ids, error_rate=0.01):
+        """
+        :param index: the index of the book ids, its size is the capacity of the filter
+        :param book_ids: iterable of the book ids
+        :param error_rate: the false positive rate of the filter
+        """
+        self.index = index
+        self.bloom_filter = BloomFilter(len(index), error_rate)
+        for book_id in book_ids:
+            self.bloom_filter.add(book_id)
+
+    def __str__(self):
+        return f"BloomFrontedIndex(index={self.index})"
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, book_id):
+        return book_id in self.bloom_filter and book_id in self.index
+
+    def close(self):
+        self.index.close()
+
+
+class _DictBookIndex(object):
+    """The book dictionary itself, which is the default index"""
+
+    def __init__(self, books):
+        self._books = books
+
+    def __str__(self):
+        return f"_DictBookIndex(size={len(self)})"
+
+    def __len__(self):
+        return len(self._books)
+
+    def __contains__(self, book_id):
+        return book_id in self._books
+
+    def close(self):
+        pass
+
+
+BOOK_INDEX_KINDS = ("dict", "sorted", "sqlite")
+
+
+def build_book_index(books, kind="dict", bloom_error_rate=None, directory=None):
+    """
+    :param books: {book_id: any} of the valid books, only the dict index keeps a reference to it
+    :param kind: one of BOOK_INDEX_KINDS
+    :param bloom_error_rate: if given the index is fronted by a Bloom filter with this false positive rate
+    :param directory: directory of the sqlite index file
+    :returns: an index that supports `in`, `len` and close
+    """
+    if kind == "dict":
+        index = _DictBookIndex(books)
+    elif kind == "sorted":
+        index = SortedBookIndex(books)
+    elif kind == "sqlite":
+        index = SqliteBookIndex(books, directory)
+    else:
+        raise ValueError(f"Unknown book index {kind}, expected one of {BOOK_INDEX_KINDS}")
+    if bloom_error_rate:
+        index = BloomFrontedIndex(index, books, bloom_error_rate)
+    return index
@@ -1,125 +1,350 @@
+import itertools
 import json
 import os
+import pickle
+import re
+import sys
+import tempfile
+import zlib
 
 from project_1.database.entities import Author, Book, Publisher, BookAuthor, Review
+from project_1.parser.book_index import build_book_index
+from project_1.parser.statistics import DatasetStatistics
+from project_1.parser.validation import Rule, RuleSet, required, exact_length, max_length
+
+
+class _BookSampler(object):
+    """
+    Decides which of the valid books are part of a sample. The decision for each book depends only on its id
+    and the seed, so every pass over the book data selects exactly the same books.
+    """
+
+    def __init__(self, book_limit=None, sample_fraction=None, seed=0):
+        """
+        :param book_limit: maximum number of books selected
+        :param sample_fraction: fraction (0 - 1) of the books selected
+        :param seed: seed of the sampling
+        """
+        self.book_limit = book_limit
+        self.sample_fraction = sample_fraction
+        self.seed = seed
+        self.selected = 0
+
+    def __str__(self):
+        return f"_BookSampler(book_limit={self.book_limit}, sample_fraction={self.sample_fraction})"
+
+    @property
+    def exhausted(self):
+        """True if the book limit has been reached"""
+        return self.book_limit is not None and self.selected >= self.book_limit
+
+    def select(self, book_id):
+        """
+        :param book_id: the id of a valid book
+        :rtype: bool
+        """
+        if self.exhausted:
+            return False
+        if self.sample_fraction is not None:
+            if zlib.crc32(f"{self.seed}:{book_id}".encode()) / 2 ** 32 >= self.sample_fraction:
+                return False
+        self.selected += 1
+        return True
 
 
 class UCSDJsonDataParser(object):
     """ Parser for handling the json data"""
     DEFAULT_DATA_PATH = os.path.join(os.path.dirname(".."), "raw_data")
     AUTHORS_FILENAME = "goodreads_book_authors.json"
-    BOOKS_FILENAME = "goodreads_books_comics_graphic.json"
-    REVIEWS_FILENAME = "goodreads_reviews_comics_graphic.json"
+    DEFAULT_GENRE = "comics_graphic"
+    BOOKS_FILENAME = "goodreads_books_{genre}.json"
+    REVIEWS_FILENAME = "goodreads_reviews_{genre}.json"
+    BATCH_SIZE = 10000
+    # used to skip the reviews of books that are not sampled without decoding them
+    REVIEW_BOOK_ID_PATTERN = re.compile(r'"book_id":\s*"([^"]*)"')
 
-    def __init__(self, data_path=None, authors_filename=None, books_filename=None, reviews_filename=None):
+    def __init__(self, data_path=None, authors_filename=None, books_filename=None, reviews_filename=None,
+                 referenced_authors_only=False, dead_letter_path=None, batch_size=None,
+                 book_limit=None, sample_fraction=None, seed=0, genre=None, book_index="dict",
+                 bloom_error_rate=None, collect_statistics=False):
         """
         :param data_path: path to the files containing the json data, defaults to DEFAULT_DATA_PATH
         :param authors_filename: filename that contains the author data
-        :param books_filename: filename that contains the book data
-        :param reviews_filename: filename that contains the review data
+        :param books_filename: filename that contains the book data, defaults to the BOOKS_FILENAME of the genre
+        :param reviews_filename: filename that contains the review data, defaults to the REVIEWS_FILENAME of the genre
+        :param referenced_authors_only: if True only the authors referenced by a valid book are kept
+        :param dead_letter_path: json lines file where the rejected records are written, disabled by default
+        :param batch_size: number of records decoded and validated at once, defaults to BATCH_SIZE
+        :param book_limit: if given, only the first book_limit sampled books are kept
+        :param sample_fraction: if given, only this fraction (0 - 1) of the books is kept
+        :param seed: seed of the book sampling
+        :param genre: the goodreads genre dataset that is parsed, defaults to DEFAULT_GENRE
+        :param book_index: index of the valid book ids used by the reviews pass, one of
+        parser.book_index.BOOK_INDEX_KINDS: dict (the book dictionary), sorted (sorted array of the ids) or
+        sqlite (temporary database file). With the sorted and sqlite indexes the book dictionary is spilled
+        to a temporary file during the pass and read back by get_parsed_book_data, so only the index is kept
+        in memory along with the reviews
+        :param bloom_error_rate: if given the book index is fronted by a Bloom filter with this false positive rate
+        :param collect_statistics: if True the dataset statistics of parser.statistics.DatasetStatistics are
+        collected while parsing
+        When the books are limited or sampled, only their authors and reviews are kept so that the parsed data
+        remain referentially closed.
         """
         self.data_path = data_path if data_path else self.DEFAULT_DATA_PATH
+        self.genre = genre if genre else self.DEFAULT_GENRE
         self.authors_filename = authors_filename if authors_filename else self.AUTHORS_FILENAME
-        self.books_filename = books_filename if books_filename else self.BOOKS_FILENAME
-        self.reviews_filename = reviews_filename if reviews_filename else self.REVIEWS_FILENAME
-        self._valid_data = {"authors": {}, "books": {}}
+        self.books_filename = books_filename if books_filename else self.BOOKS_FILENAME.format(genre=self.genre)
+        self.reviews_filename = reviews_filename if reviews_filename else self.REVIEWS_FILENAME.format(genre=self.genre)
+        self.book_limit = book_limit
+        self.sample_fraction = sample_fraction
+        self.seed = seed
+        self.referenced_authors_only = referenced_authors_only or self.is_sampled
+        self.dead_letter_path = dead_letter_path
+        self.batch_size = batch_size if batch_size else self.BATCH_SIZE
+        self.book_index = book_index
+        self.bloom_error_rate = bloom_error_rate
+        self._valid_data = {"authors": {}, "books": {}, "reviews": []}
+        self._books_path = None
+        self._book_index = None
+        self._statistics = DatasetStatistics() if collect_statistics else None
+        self._rule_sets = {}
 
     def process_data(self):
         """
         Processes the data provided, in the following order: authors, books, reviews.
         If any of the data is not loaded returns immediately.
         """
-        self._process_authors()
+        self.process_book_data()
+        self.process_review_data()
+
+    def process_book_data(self):
+        """Processes the authors and the books, the first part of process_data"""
+        self._create_rule_sets()
+        referenced_author_ids = self._scan_referenced_authors() if self.referenced_authors_only else None
+        self._process_authors(referenced_author_ids)
         self._process_books()
+
+    def process_review_data(self):
+        """Processes the reviews, the second part of process_data, after process_book_data"""
         self._process_reviews()
 
-    def _process_authors(self):
+    @property
+    def is_sampled(self):
+        """True if only a subset of the books is parsed"""
+        return self.book_limit is not None or self.sample_fraction is not None
+
+    def _book_sampler(self):
         """
-        Processes the author data and keeps only the authors that are valid.
-        A valid author must at least have an id and a name.
+        :returns: a new sampler, or None if the books are not sampled
+        :rtype: _BookSampler
         """
-        file_path = os.path.join(self.data_path, self.authors_filename)
+        return _BookSampler(self.book_limit, self.sample_fraction, self.seed) if self.is_sampled else None
+
+    def _author_rules(self):
+        """A valid author must at least have an id and a name."""
+        return [Rule("author_id_required", "author_id", required),
+                Rule("author_name_required", "name", required)]
+
+    def _book_rules(self):
+        """
+        A valid book must at least have an id and a 10 character isbn. Titles longer than 200 characters
+        and publication years that are not 4 characters long are dropped.
+        """
+        return [Rule("book_id_required", "book_id", required),
+                Rule("isbn_length", "isbn", exact_length(10)),
+                Rule("title_max_length", "title", max_length(200), Rule.NULLIFY),
+                Rule("publication_year_length", "publication_year", exact_length(4), Rule.NULLIFY)]
+
+    def _review_rules(self):
+        """
+        A valid review must at least have a text field, reference a book id that is already parsed
+        and have a valid rating.
+        """
+        return [Rule("review_text_required", "review_text", required),
+                Rule("rating_range", "rating", self._validate_review_rating),
+                Rule("book_exists", "book_id", self._book_exists)]
+
+    def get_rules(self, name):
+        """
+        :param name: authors, books or reviews
+        :returns: list of the validation rules of the records
+        """
+        return {"authors": self._author_rules, "books": self._book_rules, "reviews": self._review_rules}[name]()
+
+    def _create_rule_sets(self):
+        """
+        Creates the rule sets of a run. They share the dead letter file, which each one truncates, so they
+        are all created before any record is processed.
+        """
+        self._rule_sets = {name: RuleSet(name, self.get_rules(name), dead_letter_path=self.dead_letter_path)
+                           for name in ("authors", "books", "reviews")}
+
+    def _book_exists(self, book_id):
+        """
+        :param book_id: the book id of a review
+        :rtype: bool
+        """
+        return book_id in self._book_index
+
+    def _read_batches(self, filename, line_filter=None):
+        """
+        Reads and decodes the given json lines file in batches.
+        :param filename: the file name, relative to the data path
+        :param line_filter: if given, only the raw lines for which it returns True are decoded
+        :returns: generator of lists of decoded records
+        """
+        file_path = os.path.join(self.data_path, filename)
         with open(file_path) as fin:
-            for line in fin:
-                author_data = json.loads(line)
-                author_name = author_data.get("name")
-                author_id = author_data.get("author_id")
-                if author_name and author_id:
-                    author = Author()
-                    author.name = author_name
-                    self._valid_data["authors"][author_id] = author
+            while lines := list(itertools.islice(fin, self.batch_size)):
+                if line_filter:
+                    lines = [line for line in lines if line_filter(line)]
+                yield [json.loads(line) for line in lines]
+
+    def _scan_referenced_authors(self):
+        """
+        Scans the book data and collects the ids of the authors referenced by the books that are valid.
+        The author file contains the authors of every genre, so this allows skipping all the authors
+        that no comic book will ever reference.
+        :returns: set of author ids
+        """
+        referenced_author_ids = set()
+        # the rejections are counted during the actual book processing, so they are not recorded here
+        rules = RuleSet("books", self._book_rules())
+        sampler = self._book_sampler()
+        for batch in self._read_batches(self.books_filename):
+            if sampler and sampler.exhausted:
+                break
+            for book_data in rules.apply(batch):
+                if sampler and not sampler.select(book_data["book_id"]):
+                    continue
+                for author in book_data.get("authors") or []:
+                    if author_id := author.get("author_id"):
+                        referenced_author_ids.add(author_id)
+        return referenced_author_ids
+
+    def _process_authors(self, referenced_author_ids=None):
+        """
+        Processes the author data and keeps only the authors that are valid.
+        :param referenced_author_ids: if given, authors whose id is not contained are skipped
+        """
+        rules = self._rule_sets["authors"]
+        for batch in self._read_batches(self.authors_filename):
+            if referenced_author_ids is not None:
+                batch = [author_data for author_data in batch
+                         if author_data.get("author_id") in referenced_author_ids]
+            for author_data in rules.apply(batch):
+                author = Author()
+                author.name = author_data["name"]
+                self._valid_data["authors"][author_data["author_id"]] = author
 
     def _process_books(self):
         """
-        Processes the book data and keeps only the books that are valid.
-        A valid book must at least have an isbn and an id. Moreover creates the book_authors relations.
-        These are created by searching the authors dictionary given the author ids contained in the 'authors'
-        key of the book. Publisher entities are also created here.
+        Processes the book data and keeps only the books that are valid. Moreover creates the book_authors
+        relations. These are created by searching the authors dictionary given the author ids contained in
+        the 'authors' key of the book. Publisher entities are also created here.
         """
-        file_path = os.path.join(self.data_path, self.books_filename)
-        with open(file_path) as fin:
-            for line in fin:
-                book_data = json.loads(line)
-                book_id = book_data.get("book_id")
-                book_isbn = book_data.get("isbn")
-                if book_id and book_isbn and len(book_isbn) == 10:
-
-                    # initialize a book dictionary, it will contain a Book and it can contain a Publisher,
-                    # BookAuthor and Review objects and starts with a 0 author ordinal
-                    book_relations = {"book_authors": {}, "author_ordinal": 0, "reviews": []}
-
-                    # create a Book
-                    book = Book()
-                    book.isbn = book_isbn
-                    title = book_data.get("title")
-                    book.title = title if len(title) <= 200 else None
-                    publication_year = book_data.get("publication_year")
-                    book.publication_year = publication_year if len(publication_year) == 4 else None
-                    description = book_data.get("description")
-                    book.description = description if description else None
-
-                    # create a publisher if data is sufficient
-                    if publisher_name := book_data.get("publisher"):
-                        publisher = Publisher()
-                        publisher.name = publisher_name
-                        book_relations["publisher"] = publisher
-
-                    # add author relations if they can be added
-                    if authors := book_data.get("authors"):
-                        for author in authors:
-                            author_id = author.get("author_id")
-                            if author_id in self._valid_data["authors"].keys():
-                                validated_author = self._valid_data["authors"][author_id]
-                                book_author = BookAuthor()
-                                book_author.author = validated_author
-                                book_relations["author_ordinal"] += 1
-                                role = author.get("role")
-                                book_author.role = role if role else None
-                                book_author.ordinal = book_relations["author_ordinal"]
-                                book_relations["book_authors"][author_id] = book_author
-
-                    book_relations["book"] = book
-                    self._valid_data["books"][book_id] = book_relations
+        rules = self._rule_sets["books"]
+        sampler = self._book_sampler()
+        for batch in self._read_batches(self.books_filename):
+            if sampler and sampler.exhausted:
+                break
+            for book_data in rules.apply(batch):
+                if sampler and not sampler.select(book_data["book_id"]):
+                    continue
+                # initialize a book dictionary, it will contain a Book and it can contain a Publisher and
+                # BookAuthor objects and starts with a 0 author ordinal
+                book_relations = {"book_authors": {}, "author_ordinal": 0}
+
+                # create a Book
+                book = Book()
+                book.isbn = book_data["isbn"]
+                book.title = book_data.get("title")
+                book.publication_year = book_data.get("publication_year")
+                description = book_data.get("description")
+                book.description = description if description else None
+
+                # create a publisher if data is sufficient
+                if publisher_name := book_data.get("publisher"):
+                    publisher = Publisher()
+                    publisher.name = publisher_name
+                    book_relations["publisher"] = publisher
+
+                # add author relations if they can be added
+                if authors := book_data.get("authors"):
+                    for author in authors:
+                        author_id = author.get("author_id")
+                        if author_id in self._valid_data["authors"].keys():
+                            validated_author = self._valid_data["authors"][author_id]
+                            book_author = BookAuthor()
+                            book_author.author = validated_author
+                            book_relations["author_ordinal"] += 1
+                            role = author.get("role")
+                            book_author.role = role if role else None
+                            book_author.ordinal = book_relations["author_ordinal"]
+                            book_relations["book_authors"][author_id] = book_author
+                            if self._statistics:
+                                self._statistics.add_book_author(author_id, book_author.role)
+
+                book_relations["book"] = book
+                if self._statistics:
+                    self._statistics.add_book(book_data["book_id"], book.publication_year, publisher_name)
+                self._valid_data["books"][book_data["book_id"]] = book_relations
 
     def _process_reviews(self):
         """
-        Processes the review data and keeps only the reviews that are valid. A valid review must at least
-        have a text field, reference a book id that is already parsed and have a valid rating.
+        Processes the review data and keeps only the reviews that are valid, as (book id, Review) rows. The
+        book ids of the reviews are looked up in the book index.
         """
-        file_path = os.path.join(self.data_path, self.reviews_filename)
-        with open(file_path) as fin:
-            for line in fin:
-                review_data = json.loads(line)
-                book_id = review_data.get("book_id")
-                text = review_data.get("review_text")
-                rating = review_data.get("rating")
-                if text and self._validate_review_rating(rating) and book_id in self._valid_data["books"].keys():
+        self._book_index = build_book_index(self._valid_data["books"], self.book_index, self.bloom_error_rate)
+        if self.book_index != "dict":
+            self._spill_books()
+        try:
+            rules = self._rule_sets["reviews"]
+            reviews = self._valid_data["reviews"]
+            # when the books are sampled most of the reviews belong to books that are not kept, so they are
+            # dropped before being decoded and they are not counted as rejections
+            line_filter = self._sampled_review_filter if self.is_sampled else None
+            for batch in self._read_batches(self.reviews_filename, line_filter):
+                for review_data in rules.apply(batch):
                     review = Review()
                     created = review_data.get("date_added")
-                    review.text = text
-                    review.score = rating
+                    review.text = review_data["review_text"]
+                    review.score = review_data["rating"]
                     review.created = created if created else None
-                    self._valid_data["books"][book_id]["reviews"].append(review)
+                    # the reviews of a book share a single copy of its id
+                    reviews.append((sys.intern(review_data["book_id"]), review))
+                    if self._statistics:
+                        self._statistics.add_review(review_data["book_id"], review.score)
+        finally:
+            self._book_index.close()
+
+    def _spill_books(self):
+        """Writes the book dictionary to a temporary file and releases it, see get_parsed_book_data"""
+        with tempfile.NamedTemporaryFile(prefix="books_", suffix=".pickle", delete=False) as fout:
+            pickle.dump(self._valid_data["books"], fout, protocol=pickle.HIGHEST_PROTOCOL)
+        self._books_path = fout.name
+        self._valid_data["books"] = None
+
+    def _load_spilled_books(self):
+        """Reads back and deletes the spilled book dictionary"""
+        with open(self._books_path, "rb") as fin:
+            books = pickle.load(fin)
+        os.remove(self._books_path)
+        self._books_path = None
+        # the book authors refer to the parsed authors again, instead of their unpickled copies
+        authors = self._valid_data["authors"]
+        for book_relations in books.values():
+            for author_id, book_author in book_relations["book_authors"].items():
+                book_author.author = authors[author_id]
+        self._valid_data["books"] = books
+
+    def _sampled_review_filter(self, line):
+        """
+        :param line: a raw line of the review data
+        :returns: False if the line certainly refers to a book that is not parsed
+        """
+        match = self.REVIEW_BOOK_ID_PATTERN.search(line)
+        return match is None or match.group(1) in self._book_index
 
     @staticmethod
     def _validate_review_rating(review_rating: int):
@@ -138,6 +363,36 @@ class UCSDJsonDataParser(object):
 
     def get_parsed_book_data(self):
         """
-        :returns: The book data parsed
+        :returns: The book data parsed, without their reviews, see get_parsed_review_data
         """
+        if self._books_path:
+            self._load_spilled_books()
         return self._valid_data["books"]
+
+    def get_parsed_review_data(self):
+        """
+        :returns: The review data parsed, as a list of (book_id, database.entities.Review)
+        """
+        return self._valid_data["reviews"]
+
+    def get_dataset_statistics(self):
+        """
+        :returns: the finalized statistics of parser.statistics.DatasetStatistics, None if they are not collected
+        """
+        return self._statistics.finalize() if self._statistics else None
+
+    def save_dataset_statistics(self, path):
+        """
+        Saves the dataset statistics as json, or as numpy arrays if the path ends with .npz.
+        :param path: the output file path
+        """
+        if not self._statistics:
+            raise ValueError("The dataset statistics are not collected, see collect_statistics")
+        self._statistics.save(path)
+
+    def get_rejection_statistics(self):
+        """
+        :returns: {"authors" | "books" | "reviews": {"processed": int, "rejected": int,
+                   "rules": {rule_name: int}}} for the data processed so far
+        """
+        return {name: rule_set.statistics() for name, rule_set in self._rule_sets.items()}
@@ -0,0 +1,156 @@
+"""Dataset statistics collected by the parser in the same pass that validates the records"""
+import array
+import json
+
+import numpy as np
+
+
+class _Vocabulary(object):
+    """Assigns consecutive integer codes to the distinct values it sees"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def __str__(self):
+        return f"_Vocabulary(size={len(self.values)})"
+
+    def code(self, value):
+        """
+        :returns: the code of the value, a new one if the value has not been seen before
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class DatasetStatistics(object):
+    """
+    Counters of the parsed dataset: reviews per book, rating distribution, books per author and role and books
+    per publication year and publisher. Each record only appends the codes of its values to compact arrays,
+    which are counted with numpy when the statistics are finalized.
+    """
+    # books with at least this many reviews share the last bucket of the reviews per book histogram
+    REVIEWS_HISTOGRAM_CAP = 50
+    TOP = 20
+    MISSING = "(missing)"
+
+    def __init__(self):
+        self._books = _Vocabulary()
+        self._authors = _Vocabulary()
+        self._roles = _Vocabulary()
+        self._publishers = _Vocabulary()
+        self._book_years = array.array("q")
+        self._book_publishers = array.array("q")
+        self._book_author_authors = array.array("q")
+        self._book_author_roles = array.array("q")
+        self._review_books = array.array("q")
+        self._review_ratings = array.array("b")
+
+    def __str__(self):
+        return f"DatasetStatistics(books={len(self._books.values)}, reviews={len(self._review_books)})"
+
+    def add_book(self, book_id, publication_year, publisher):
+        """
+        :param book_id: the goodreads id of a valid book
+        :param publication_year: the 4 character year or None
+        :param publisher: the publisher name or None
+        """
+        self._books.code(book_id)
+        self._book_years.append(int(publication_year) if publication_year and publication_year.isdigit() else 0)
+        self._book_publishers.append(self._publishers.code(publisher if publisher else self.MISSING))
+
+    def add_book_author(self, author_id, role):
+        """
+        :param author_id: the goodreads id of the author of a valid book
+        :param role: the role of the author or None
+        """
+        self._book_author_authors.append(self._authors.code(author_id))
+        self._book_author_roles.append(self._roles.code(role if role else self.MISSING))
+
+    def add_review(self, book_id, rating):
+        """
+        :param book_id: the goodreads id of the book of a valid review
+        :param rating: the rating (1 - 5) of the review
+        """
+        self._review_books.append(self._books.codes[book_id])
+        self._review_ratings.append(rating)
+
+    def arrays(self):
+        """
+        :returns: {name: numpy array} of the counts, along with the labels of the labelled counts
+        """
+        reviews_per_book = np.bincount(np.frombuffer(self._review_books, dtype=np.int64),
+                                       minlength=len(self._books.values))
+        books_per_author = np.bincount(np.frombuffer(self._book_author_authors, dtype=np.int64),
+                                       minlength=len(self._authors.values))
+        return {
+            "reviews_per_book": reviews_per_book,
+            "reviews_per_book_histogram": np.bincount(np.minimum(reviews_per_book, self.REVIEWS_HISTOGRAM_CAP),
+                                                      minlength=self.REVIEWS_HISTOGRAM_CAP + 1),
+            "rating_counts": np.bincount(np.frombuffer(self._review_ratings, dtype=np.int8), minlength=6)[1:],
+            "books_per_author": books_per_author,
+            "author_ids": np.array(self._authors.values, dtype=str),
+            "role_counts": np.bincount(np.frombuffer(self._book_author_roles, dtype=np.int64),
+                                       minlength=len(self._roles.values)),
+            "roles": np.array(self._roles.values, dtype=str),
+            "year_counts": np.bincount(np.frombuffer(self._book_years, dtype=np.int64)),
+            "publisher_counts": np.bincount(np.frombuffer(self._book_publishers, dtype=np.int64),
+                                            minlength=len(self._publishers.values)),
+            "publishers": np.array(self._publishers.values, dtype=str)
+        }
+
+    @classmethod
+    def _distribution(cls, counts):
+        """
+        :param counts: numpy array of counts
+        :returns: {"count": int, "total": int, "mean": float, "median": float, "p90": float, "max": int}
+        """
+        if not counts.size:
+            return {"count": 0, "total": 0, "mean": None, "median": None, "p90": None, "max": None}
+        return {"count": int(counts.size), "total": int(counts.sum()), "mean": float(counts.mean()),
+                "median": float(np.median(counts)), "p90": float(np.percentile(counts, 90)),
+                "max": int(counts.max())}
+
+    @classmethod
+    def _top(cls, labels, counts):
+        """
+        :returns: {label: count} of the TOP largest counts, in descending order
+        """
+        order = np.argsort(counts, kind="stable")[::-1][:cls.TOP]
+        return {str(labels[index]): int(counts[index]) for index in order}
+
+    def finalize(self):
+        """
+        :returns: the statistics as a json serializable dict
+        """
+        arrays = self.arrays()
+        histogram = arrays["reviews_per_book_histogram"]
+        years = arrays["year_counts"]
+        return {
+            "reviews_per_book": {**self._distribution(arrays["reviews_per_book"]),
+                                 "histogram": {(f"{reviews}" if reviews < self.REVIEWS_HISTOGRAM_CAP else
+                                                f">={reviews}"): int(books)
+                                               for reviews, books in enumerate(histogram)}},
+            "ratings": {str(rating): int(count) for rating, count in enumerate(arrays["rating_counts"], 1)},
+            "books_per_author": {**self._distribution(arrays["books_per_author"]),
+                                 "top": self._top(arrays["author_ids"], arrays["books_per_author"])},
+            "books_per_role": {str(role): int(count) for role, count in zip(arrays["roles"], arrays["role_counts"])},
+            "books_per_year": {**{str(year): int(years[year]) for year in np.flatnonzero(years) if year},
+                               self.MISSING: int(years[0]) if years.size else 0},
+            "books_per_publisher": {"publishers": int(np.count_nonzero(arrays["publishers"] != self.MISSING)),
+                                    "top": self._top(arrays["publishers"], arrays["publisher_counts"])}
+        }
+
+    def save(self, path):
+        """
+        Saves the statistics, as numpy arrays if the path ends with .npz and as json otherwise.
+        :param path: the output file path
+        """
+        if path.endswith(".npz"):
+            np.savez_compressed(path, **self.arrays())
+            return
+        with open(path, "w") as fout:
+            json.dump(self.finalize(), fout, indent=2)
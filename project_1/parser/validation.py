@@ -0,0 +1,123 @@
+"""Declarative validation of the decoded json records"""
+import json
+from itertools import compress
+from operator import methodcaller
+
+
+def required(value):
+    """Checks that the value is present and not empty"""
+    return bool(value)
+
+
+def exact_length(length):
+    """
+    :param length: the length the value must have
+    :returns: check that succeeds when the value has exactly the given length
+    """
+    return lambda value: value is not None and len(value) == length
+
+
+def max_length(length):
+    """
+    :param length: the maximum length of the value
+    :returns: check that succeeds when the value is missing or at most the given length
+    """
+    return lambda value: value is None or len(value) <= length
+
+
+class Rule(object):
+    """
+    A validation rule for a single field of a record. When the check of the rule fails, the record is either
+    rejected (REJECT) or the field is set to None (NULLIFY).
+    """
+    REJECT = "reject"
+    NULLIFY = "nullify"
+
+    def __init__(self, name, field, check, action=REJECT):
+        """
+        :param name: the name of the rule, used in the statistics and the dead letter file
+        :param field: the record key that the rule validates
+        :param check: callable that takes the field value and returns True if it is valid
+        :param action: REJECT or NULLIFY
+        """
+        if action not in (self.REJECT, self.NULLIFY):
+            raise ValueError(f"Unknown rule action {action}")
+        self.name = name
+        self.field = field
+        self.check = check
+        self.action = action
+
+    def __str__(self):
+        return f"Rule(name={self.name}, field={self.field}, action={self.action})"
+
+
+class RuleSet(object):
+    """
+    A compiled set of rules that is applied on batches of records. Keeps the number of records each rule
+    affected and optionally writes the rejected records into a dead letter (json lines) file.
+    """
+
+    def __init__(self, name, rules, dead_letter_path=None):
+        """
+        :param name: the name of the rule set, written along with the rejected records
+        :param rules: iterable of Rule objects, rejection rules are evaluated in the given order
+        :param dead_letter_path: path of the json lines file rejected records are appended to, it is truncated
+        when the rule set is created, so rule sets that share the file must be created before applying any
+        """
+        self.name = name
+        self.dead_letter_path = dead_letter_path
+        rules = list(rules)
+        # compile the rules into plain tuples of (name, field getter, check)
+        self._reject_rules = tuple((rule.name, methodcaller("get", rule.field), rule.check) for rule in rules
+                                   if rule.action == Rule.REJECT)
+        self._nullify_rules = tuple((rule.name, rule.field, rule.check) for rule in rules
+                                    if rule.action == Rule.NULLIFY)
+        self._counters = {rule.name: 0 for rule in rules}
+        self._processed = 0
+        self._rejected = 0
+        if dead_letter_path:
+            open(dead_letter_path, "w").close()
+
+    def __str__(self):
+        return f"RuleSet(name={self.name})"
+
+    def apply(self, records):
+        """
+        Applies the rules on a batch of records, one rule at a time over all the records that are still valid,
+        so each rule is a single map over a column of the batch. NULLIFY rules modify the records in place.
+        :param records: list of decoded records (dicts)
+        :returns: list of the records that were not rejected
+        """
+        counters = self._counters
+        valid, rejected = records, []
+        for name, getter, check in self._reject_rules:
+            passed = [bool(result) for result in map(check, map(getter, valid))]
+            if all(passed):
+                continue
+            rejected.extend((name, record) for record, ok in zip(valid, passed) if not ok)
+            valid = list(compress(valid, passed))
+            counters[name] += len(passed) - len(valid)
+        for name, field, check in self._nullify_rules:
+            failed = [not result for result in map(check, map(methodcaller("get", field), valid))]
+            for record in compress(valid, failed):
+                record[field] = None
+                counters[name] += 1
+        self._processed += len(records)
+        self._rejected += len(rejected)
+        if rejected and self.dead_letter_path:
+            self._write_dead_letters(rejected)
+        return list(valid)
+
+    def _write_dead_letters(self, rejected):
+        """
+        :param rejected: list of (rule name, record) tuples
+        """
+        with open(self.dead_letter_path, "a") as fout:
+            for rule_name, record in rejected:
+                fout.write(json.dumps({"rule_set": self.name, "rule": rule_name, "record": record}) + "\n")
+
+    def statistics(self):
+        """
+        :returns: {"processed": int, "rejected": int, "rules": {rule_name: int}}
+        """
+        return {"processed": self._processed, "rejected": self._rejected, "rules": dict(self._counters)}